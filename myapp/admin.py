@@ -12,11 +12,13 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'table_number', 'status', 'total_price', 'is_paid', 'created_at')
+    list_display = ('id', 'owner', 'user', 'table_number', 'item_summary', 'status', 'total_price', 'is_paid', 'created_at')
     list_filter = ('status', 'is_paid', 'created_at')
     search_fields = ('user__username', 'table_number')
     inlines = [OrderItemInline]
-    readonly_fields = ('user', 'table_number', 'total_price', 'created_at', 'updated_at')
+    readonly_fields = ('owner', 'user', 'table_number', 'total_price', 'line_count', 'item_summary', 'created_at', 'updated_at')
+    # NEW: Skip the unfiltered COUNT(*) over the whole table on every changelist page
+    show_full_result_count = False
     
 admin.site.register(Item)
 # We can also register OrderItem if needed, but it's handled via OrderAdmin now
\ No newline at end of file
@@ -0,0 +1,161 @@
+# mysite/myapp/analytics.py
+
+"""Hourly and daily revenue series per restaurant, from the RevenueBucket rollup.
+
+A paid order adds its total to the hour and the day (local time) in which it
+was placed. ordering._transition applies a +1 delta when orders become paid
+and a -1 delta when paid orders are refunded, in the same transaction and in
+the same way as the item sales rollup (rollups.py). A refund therefore comes
+off the bucket the payment went to, and archiving orders changes nothing.
+
+A chart reads at most one row per bucket through the unique
+(owner, period, start) index, so its cost depends on the number of buckets
+shown and not on the order history. ``rebuild()`` (the
+``rebuild_revenue_buckets`` command) recomputes the buckets from the orders
+with the equivalent TruncHour/TruncDay aggregate, and ``verify()`` compares the
+two.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order, RevenueBucket
+from .rollups import increment
+
+PERIODS = {'hour': TruncHour, 'day': TruncDay}
+# Buckets a chart shows by default and at most
+DEFAULT_BUCKETS = {'hour': 24, 'day': 30}
+MAX_BUCKETS = {'hour': 24 * 14, 'day': 366}
+CENT = Decimal('0.01')
+
+
+def bucket_start(moment, period):
+    """The start of the local hour or day containing `moment`, as an aware datetime."""
+    if period == 'hour':
+        return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return timezone.make_aware(datetime.combine(timezone.localdate(moment), time.min))
+
+
+def bucket_starts(period, count, end=None):
+    """The starts of the `count` buckets up to and including the one containing `end` (default: now).
+
+    Local aware datetimes, oldest first.
+    """
+    # Looked up once: it is a context-local read, and a chart has hundreds of buckets
+    tz = timezone.get_current_timezone()
+    last = bucket_start(end or timezone.now(), period)
+    if period == 'hour':
+        # Stepped in UTC so a DST change doesn't skip or repeat an hour
+        last = last.astimezone(dt_timezone.utc)
+        return [(last - timedelta(hours=n)).astimezone(tz) for n in range(count - 1, -1, -1)]
+    last_day = last.date()
+    return [
+        timezone.make_aware(datetime.combine(last_day - timedelta(days=n), time.min), tz)
+        for n in range(count - 1, -1, -1)
+    ]
+
+
+def apply_orders(orders, sign=1):
+    """Adds (sign=1) or removes (sign=-1) paid orders from their hour and day buckets."""
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for order in orders:
+        if order.owner_id is None:
+            continue
+        for period in PERIODS:
+            key = (order.owner_id, period, bucket_start(order.created_at, period))
+            deltas[key][0] += sign
+            deltas[key][1] += sign * Decimal(order.total_price)
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (owner_id, period, start), (orders_delta, revenue) in deltas.items():
+            increment(
+                RevenueBucket, {'owner_id': owner_id, 'period': period, 'start': start},
+                orders=orders_delta, revenue=revenue,
+            )
+
+
+def revenue_series(owner, period, count=None, end=None):
+    """Chart-ready revenue of the owner's last `count` buckets, zero-filled, oldest first."""
+    count = count or DEFAULT_BUCKETS[period]
+    starts = bucket_starts(period, count, end)
+    rows = {
+        start: (orders, revenue)
+        for start, orders, revenue in RevenueBucket.objects.filter(
+            owner=owner, period=period, start__gte=starts[0], start__lte=starts[-1],
+        ).values_list('start', 'orders', 'revenue')
+    }
+    orders = [rows.get(start, (0, 0))[0] for start in starts]
+    revenue = [Decimal(rows.get(start, (0, 0))[1]) for start in starts]
+    return {
+        'period': period,
+        'labels': [start.isoformat() for start in starts],
+        'orders': orders,
+        'revenue': [float(value) for value in revenue],
+        'total_orders': sum(orders),
+        'total_revenue': str(sum(revenue, Decimal('0.00'))),
+    }
+
+
+def raw_revenue(period, owner_ids=None):
+    """Aggregates paid orders, live and archived, per (owner, bucket start) straight from the order tables.
+
+    Returns {(owner_id, start): [orders, revenue]}.
+    """
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    for model in (Order, ArchivedOrder):
+        paid = model.objects.filter(is_paid=True, owner__isnull=False)
+        if owner_ids is not None:
+            paid = paid.filter(owner__in=owner_ids)
+        rows = paid.annotate(start=PERIODS[period]('created_at')).values('owner', 'start').annotate(
+            orders=Count('id'), revenue=Sum('total_price'),
+        ).order_by()
+        # A bucket split by the archive cutoff has rows in both tables
+        for row in rows.iterator():
+            key = (row['owner'], row['start'])
+            totals[key][0] += row['orders']
+            # SQLite sums decimals as floats, so round off the float error
+            totals[key][1] += Decimal(row['revenue']).quantize(CENT)
+    return totals
+
+
+def rebuild(owner_ids=None, batch_size=1000):
+    """Replaces the revenue buckets (optionally only for some owners) with a fresh aggregate. Returns the row count."""
+    with transaction.atomic():
+        existing = RevenueBucket.objects.all()
+        if owner_ids is not None:
+            existing = existing.filter(owner__in=owner_ids)
+        existing.delete()
+        created = 0
+        for period in PERIODS:
+            created += len(RevenueBucket.objects.bulk_create([
+                RevenueBucket(owner_id=owner_id, period=period, start=start, orders=orders, revenue=revenue)
+                for (owner_id, start), (orders, revenue) in raw_revenue(period, owner_ids).items()
+            ], batch_size=batch_size))
+    return created
+
+
+def verify(owner_ids=None):
+    """Compares the buckets with the raw aggregate. Returns a list of (owner_id, period, start, expected, actual)."""
+    mismatches = []
+    for period in PERIODS:
+        expected = raw_revenue(period, owner_ids)
+        stored = RevenueBucket.objects.filter(period=period)
+        if owner_ids is not None:
+            stored = stored.filter(owner__in=owner_ids)
+        actual = {
+            (owner_id, start): (orders, revenue)
+            for owner_id, start, orders, revenue in stored.values_list('owner', 'start', 'orders', 'revenue')
+        }
+        for key in sorted(set(expected) | set(actual)):
+            want = tuple(expected.get(key, (0, Decimal('0'))))
+            got = tuple(actual.get(key, (0, Decimal('0'))))
+            if want != got:
+                mismatches.append((key[0], period, key[1], want, got))
+    return mismatches
@@ -0,0 +1,174 @@
+# mysite/myapp/api.py
+
+"""Versioned JSON API for the customer menu, cart and ordering (``/api/v1/``).
+
+The menu listing shares the per-restaurant cache and version stamp of the HTML
+menu (menu_cache.py) and answers conditional GETs with 304. Cart endpoints
+return just the updated cart, so adding an item costs no menu query or render.
+Unsafe methods are CSRF-protected like the rest of the site; the menu page sets
+the ``csrftoken`` cookie that the browser sends back in ``X-CSRFToken``.
+"""
+
+import json
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from .cart import MAX_LINE_QUANTITY, add_item, hydrate_cart, load_cart, save_cart
+from .menu_cache import get_menu_items, get_menu_version
+from .models import Item
+from .ordering import ItemsUnavailable, place_order
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _error(message, status, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def _item_json(item):
+    return {
+        'id': item.id,
+        'name': item.item_name,
+        'description': item.item_description,
+        'price': str(item.item_price),
+        'image': item.large_image_url,
+        'thumbnail': item.thumbnail_url,
+    }
+
+
+def _cart_json(cart):
+    lines, total = hydrate_cart(cart)
+    return {
+        'items': [
+            {
+                'id': line['id'],
+                'name': line['name'],
+                'price': str(line['price']),
+                'quantity': line['quantity'],
+                'line_total': str(line['line_total']),
+                'is_available': line['is_available'],
+            }
+            for line in lines
+        ],
+        'count': sum(line['quantity'] for line in lines),
+        'total': str(total),
+    }
+
+
+def _read_quantity(request, default, minimum):
+    """Reads an optional integer "quantity" from a JSON body. Returns None if it is invalid."""
+    if request.content_type != 'application/json' or not request.body:
+        return default
+    try:
+        quantity = json.loads(request.body).get('quantity', default)
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or not minimum <= quantity <= MAX_LINE_QUANTITY:
+        return None
+    return quantity
+
+
+@require_GET
+def menu(request, username):
+    """Available items for one restaurant, keyset-paginated by id with ?cursor=<last id>&limit=N."""
+    try:
+        after_id = int(request.GET.get('cursor', 0))
+        limit = min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return _error("cursor and limit must be integers.", 400)
+    if limit < 1:
+        return _error("limit must be positive.", 400)
+
+    version = get_menu_version(username)
+    etag = quote_etag(f"{username}-{version}-{after_id}-{limit}")
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(version))
+    if not_modified is not None:
+        return not_modified
+
+    # Cached rows are in id order, so the page is the first `limit` rows after the cursor
+    rows = [item for item in get_menu_items(username, version) if item.id > after_id]
+    page = rows[:limit]
+    next_cursor = page[-1].id if len(rows) > limit else None
+
+    response = JsonResponse({
+        'restaurant': username,
+        'items': [_item_json(item) for item in page],
+        'next_cursor': next_cursor,
+    })
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(int(version))
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+@require_GET
+def cart(request):
+    return JsonResponse(_cart_json(load_cart(request)))
+
+
+@require_http_methods(['POST', 'PUT', 'DELETE'])
+def cart_item(request, item_id):
+    """POST adds {"quantity": n} (default 1), PUT sets it (0 removes), DELETE removes the line."""
+    cart = load_cart(request)
+    item_key = str(item_id)
+
+    if request.method == 'DELETE':
+        cart.pop(item_key, None)
+        return save_cart(JsonResponse(_cart_json(cart)), cart)
+
+    # FIX: Only PUT may send 0 (to remove the line); a POST of 0 would add an empty line
+    minimum = 1 if request.method == 'POST' else 0
+    quantity = _read_quantity(request, default=1 if request.method == 'POST' else None, minimum=minimum)
+    if quantity is None:
+        return _error(f"quantity must be an integer between {minimum} and {MAX_LINE_QUANTITY}.", 400)
+
+    if request.method == 'PUT' and quantity == 0:
+        cart.pop(item_key, None)
+        return save_cart(JsonResponse(_cart_json(cart)), cart)
+
+    get_object_or_404(Item.objects.only('id'), id=item_id, is_available=True)
+    if request.method == 'PUT':
+        cart.pop(item_key, None)
+    if not add_item(cart, item_id, quantity):
+        return _error("Cart is full.", 409)
+    return save_cart(JsonResponse(_cart_json(cart)), cart)
+
+
+@require_POST
+def orders(request):
+    """Places the current cart as one order per restaurant and clears the cart."""
+    cart = load_cart(request)
+    if not cart:
+        return _error("Cart is empty.", 400)
+    try:
+        new_orders, order_items = place_order(request, cart)
+    except ItemsUnavailable as unavailable:
+        for item_key in unavailable.item_ids:
+            del cart[item_key]
+        response = _error(
+            "Some items are no longer available.", 409,
+            unavailable=[int(item_key) for item_key in unavailable.item_ids], cart=_cart_json(cart),
+        )
+        return save_cart(response, cart)
+
+    payload = {
+        'orders': [
+            {
+                'id': order.id,
+                'status': order.status,
+                'table_number': order.table_number,
+                'total_price': str(order.total_price),
+                'items': [
+                    {'name': line.item_name, 'price': str(line.item_price), 'quantity': line.quantity}
+                    for line in order_items if line.order is order
+                ],
+            }
+            for order in new_orders
+        ],
+    }
+    return save_cart(JsonResponse(payload, status=201), {})
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self):
+        # NEW: Connects the SQLite PRAGMA tuning to connection_created
+        from . import db_tuning  # noqa: F401
+        # NEW: Registers the background jobs in every app's tasks.py
+        from . import tasks
+        tasks.autodiscover()
@@ -0,0 +1,115 @@
+# mysite/myapp/async_views.py
+
+"""Async versions of the customer ordering views, served under ``mysite.asgi``.
+
+Under ASGI a sync view runs whole in the single thread-sensitive executor
+shared by every request, so at peak phones queue for that one thread while
+the event loop idles. These views stay on the event loop and only hand the
+individual database and cache calls to the executor (Django's async ORM,
+``request.session.aget``, ``cache.aget``). Each view loads the session once,
+with ``aget``, before anything reads it. After that the flash messages, the
+template context processors and the session middleware use the loaded copy
+and never query the database from the loop.
+
+Checkout writes its orders in one transaction, and Django can't keep a
+transaction open across async ORM calls. So ``place_order`` runs as one
+``sync_to_async`` call.
+
+``myapp/urls.py`` routes the customer paths here when the
+``ASYNC_CUSTOMER_VIEWS`` setting is on, which ``mysite/asgi.py`` does by
+default. WSGI deployments keep the sync views in views.py.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.csrf import ensure_csrf_cookie
+
+from . import search
+from .cart import add_item, ahydrate_cart, load_cart, save_cart
+from .menu_cache import aget_menu_items, aget_menu_version
+from .models import Item
+from .ordering import ItemsUnavailable, place_order
+from .views import _menu_filters, _menu_response, _menu_validators, _next_page_url, _remember_table
+
+
+async def _load_session(request):
+    """Loads the session off the event loop. Later sync reads and writes only touch the loaded copy."""
+    await request.session.aget('table_number')
+
+
+@ensure_csrf_cookie
+async def menu(request, username=None, table_id=None):
+    """Async version of views.menu."""
+    await _load_session(request)
+    table_number = _remember_table(request, username, table_id)
+
+    version = await aget_menu_version(username)
+    etag, not_modified = _menu_validators(request, username, table_number, version)
+    if not_modified is not None:
+        return not_modified
+
+    filters = _menu_filters(request)
+    context = {
+        'table_number': table_number,
+        'filters': filters,
+    }
+    if username and not any(filters.values()):
+        context['item_list'] = await aget_menu_items(username, version)
+    else:
+        context['item_list'], next_cursor = await search.amenu_page(username, **filters)
+        if next_cursor:
+            context['next_page_url'] = _next_page_url(request, next_cursor)
+    return _menu_response(request, context, etag, version)
+
+
+async def add_to_cart(request, item_id):
+    """Async version of views.add_to_cart."""
+    item = await aget_object_or_404(Item.objects.only('id', 'item_name'), id=item_id)
+    cart = load_cart(request)
+
+    await _load_session(request)
+    if add_item(cart, item.id):
+        messages.success(request, f"{item.item_name} added to cart!")
+    else:
+        messages.warning(request, "Your cart is full. Please place your order first.")
+
+    menu_redirect_url = request.session.get('menu_redirect_url', reverse('myapp:menu'))
+    return save_cart(redirect(menu_redirect_url), cart)
+
+
+async def view_cart(request):
+    """Async version of views.view_cart."""
+    cart_lines, cart_total = await ahydrate_cart(load_cart(request))
+    context = {
+        'cart_items': cart_lines,
+        'cart_total': cart_total,
+        'table_number': await request.session.aget('table_number', 'N/A'),
+    }
+    return render(request, 'myapp/cart.html', context)
+
+
+async def checkout(request):
+    """Async version of views.checkout."""
+    cart = load_cart(request)
+    if not cart:
+        return redirect('myapp:menu')
+    if request.method != 'POST':
+        return redirect('myapp:view_cart')
+
+    await _load_session(request)
+    try:
+        # One transaction, so one trip to the executor (see the module docstring)
+        new_orders, order_items = await sync_to_async(place_order)(request, cart)
+    except ItemsUnavailable as unavailable:
+        for item_id_str in unavailable.item_ids:
+            del cart[item_id_str]
+        messages.error(request, f"Sorry, no longer available: {', '.join(unavailable.names) or 'some items'}. Please review your order.")
+        return save_cart(redirect('myapp:view_cart'), cart)
+
+    response = render(request, 'myapp/checkout_success.html', {
+        'orders': new_orders,
+        'menu_redirect_url': request.session.get('menu_redirect_url', reverse('myapp:menu')),
+    })
+    return save_cart(response, {})
@@ -0,0 +1,653 @@
+# mysite/myapp/benchmarking.py
+
+"""Shared helpers for the ``bench_*`` management commands.
+
+Benchmarks never touch the configured database: ``scratch_database`` creates a
+throwaway copy of the schema (a temporary SQLite file, or a ``test_`` database
+on PostgreSQL), points the default connection at it and drops it afterwards.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import Count, Sum
+from django.template.loader import render_to_string
+from django.test import AsyncClient, Client, RequestFactory
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import analytics, rollups
+from . import search
+from mysite.images import store_image
+from .menu_cache import menu_queryset
+from .models import Item, Order, OrderItem
+
+
+@contextmanager
+def scratch_database(journal_mode='wal'):
+    """Runs the block against a freshly migrated throwaway database."""
+    settings_dict = connection.settings_dict
+    old_name = settings_dict['NAME']
+    old_test_name = settings_dict.setdefault('TEST', {}).get('NAME')
+    tmpdir = None
+    if connection.vendor == 'sqlite':
+        # A file (not the default in-memory test DB) so threads share one database
+        tmpdir = tempfile.mkdtemp(prefix='foodapp-bench-')
+        settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    # Lets the test Client through ALLOWED_HOSTS; already done when run from the test suite
+    try:
+        setup_test_environment()
+        own_test_environment = True
+    except RuntimeError:
+        own_test_environment = False
+    try:
+        if connection.vendor == 'sqlite' and journal_mode:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+        yield
+    finally:
+        if own_test_environment:
+            teardown_test_environment()
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_dict['TEST']['NAME'] = old_test_name
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def seed_restaurant(username, items=20, price=5):
+    """Creates a restaurant owner with `items` available menu items."""
+    owner = User.objects.create_user(username, password='bench-pass-123')
+    Item.objects.bulk_create([
+        Item(user_name=owner, item_name=f'{username} dish {n}', item_description='Benchmark dish',
+             item_price=price + n % 7)
+        for n in range(items)
+    ])
+    return owner
+
+
+def hammer(task, runs, threads):
+    """Calls task(run_index) `runs` times from a pool of `threads` threads.
+
+    Returns (wall_seconds, latencies, errors): per-call latencies of successful
+    calls and a list of the exceptions raised by failed ones. A task that does
+    untimed setup can return the latency of the part it measured itself.
+    """
+    def timed(run_index):
+        start = time.perf_counter()
+        try:
+            measured = task(run_index)
+            return (measured if measured is not None else time.perf_counter() - start), None
+        except Exception as exc:  # noqa: BLE001 - failures are part of the measurement
+            return None, exc
+        finally:
+            # Like the end of a request: keeps the thread's connection if CONN_MAX_AGE allows
+            close_old_connections()
+
+    # Every worker thread closes its own connection once all calls are done
+    barrier = threading.Barrier(threads)
+
+    def close_connection(_):
+        barrier.wait()
+        connections.close_all()
+
+    # Failed requests are counted below; don't print a traceback for each one
+    request_logger = logging.getLogger('django.request')
+    old_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(timed, range(runs)))
+            wall = time.perf_counter() - start
+            list(pool.map(close_connection, range(threads)))
+    finally:
+        request_logger.setLevel(old_level)
+    latencies = [latency for latency, error in results if error is None]
+    errors = [error for latency, error in results if error is not None]
+    return wall, latencies, errors
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def summary(label, wall, latencies, errors):
+    """One-line human readable result for a hammer() run."""
+    return (
+        f"{label}: {len(latencies)} ok, {len(errors)} failed in {wall:.2f}s "
+        f"({len(latencies) / wall if wall else 0:.1f}/s), "
+        f"p50 {percentile(latencies, 50) * 1000:.1f}ms, p95 {percentile(latencies, 95) * 1000:.1f}ms"
+    )
+
+
+@contextmanager
+def scratch_media():
+    """Points MEDIA_ROOT at a temporary directory so seeded images don't land in pictures/."""
+    media_root = tempfile.mkdtemp(prefix='foodapp-bench-media-')
+    try:
+        with override_settings(MEDIA_ROOT=media_root):
+            yield media_root
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def _sample_images(count):
+    """Stores `count` distinct menu photos (as uploaded through the item form) and returns their names."""
+    names = []
+    for n in range(count):
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), ((n * 53) % 256, (n * 97) % 256, (n * 151) % 256)).save(buffer, format='JPEG')
+        names.append(store_image(buffer.getvalue()))
+    return names
+
+
+def seed_order_history(owners, orders, lines=2, days=365, batch_size=5000):
+    """Bulk-inserts `orders` paid, completed orders spread over the owners and the past `days`.
+
+    Rebuilds the sales rollup afterwards so the dashboard reads consistent data.
+    """
+    rng = random.Random(0)
+    menus = {owner.id: list(Item.objects.filter(user_name=owner).values_list('id', 'item_name', 'item_price'))
+             for owner in owners}
+    now = timezone.now()
+    created = 0
+    while created < orders:
+        size = min(batch_size, orders - created)
+        day = now - timedelta(days=created * days // orders + 1)
+        picks = []
+        for n in range(size):
+            owner = owners[(created + n) % len(owners)]
+            menu = menus[owner.id]
+            lines_for_order = [
+                (item_id, item_name, Decimal(item_price), rng.randint(1, 3))
+                for item_id, item_name, item_price in rng.sample(menu, min(lines, len(menu)))
+            ]
+            picks.append((owner, lines_for_order))
+        with transaction.atomic():
+            batch = Order.objects.bulk_create([
+                Order(owner=owner, table_number=str(rng.randint(1, 30)), status='Completed', is_paid=True,
+                      total_price=sum(price * quantity for _, _, price, quantity in lines_for_order))
+                for owner, lines_for_order in picks
+            ])
+            # created_at is auto_now_add, so the backdating is a second step
+            Order.objects.filter(id__gte=batch[0].id, id__lte=batch[-1].id).update(created_at=day, updated_at=day)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, item_id=item_id, item_name=item_name, item_price=price, quantity=quantity)
+                for order, (_, lines_for_order) in zip(batch, picks)
+                for item_id, item_name, price, quantity in lines_for_order
+            ], batch_size=batch_size)
+        created += size
+    rollups.rebuild()
+
+
+def seed_view_benchmark(restaurants=5, items=50, orders=20000, pending=50, images=8):
+    """Seeds restaurants with photographed menus, order history and `pending` live orders for the first one."""
+    image_names = _sample_images(images)
+    owners = []
+    for r in range(restaurants):
+        owner = User.objects.create_user(f'bench-chef-{r}', email=f'chef{r}@example.com', password='bench-pass-123')
+        Item.objects.bulk_create([
+            Item(user_name=owner, item_name=f'Dish {r}-{n}', item_description='A benchmark dish, freshly made.',
+                 item_price=5 + n % 7, item_image=image_names[n % len(image_names)])
+            for n in range(items)
+        ])
+        owners.append(owner)
+    seed_order_history(owners, orders)
+
+    # In preparation, so the update_order_status scenario can complete them
+    live_orders = seed_active_orders(owners[0], pending, status='Preparing')
+    return owners, [order.id for order in live_orders]
+
+
+def seed_active_orders(owner, count, status='Pending'):
+    """Bulk-inserts `count` one-line unpaid orders for the owner, spread over 30 tables."""
+    first_item = Item.objects.filter(user_name=owner).first()
+    live_orders = Order.objects.bulk_create([
+        Order(owner=owner, table_number=str(n % 30 + 1), status=status, total_price=first_item.item_price)
+        for n in range(count)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, item=first_item, item_name=first_item.item_name,
+                  item_price=first_item.item_price, quantity=1)
+        for order in live_orders
+    ])
+    return live_orders
+
+
+def view_scenarios(owner, pending_order_ids):
+    """The views to benchmark, as {name: setup(run_index) -> request()}.
+
+    Each setup does untimed preparation (logging in, filling a cart) and
+    returns a callable that makes the one request being measured.
+    """
+    menu_url = reverse('myapp:menu_with_table', kwargs={'username': owner.username, 'table_id': '7'})
+    item_ids = list(Item.objects.filter(user_name=owner).values_list('id', flat=True)[:3])
+
+    def customer(with_cart=False):
+        client = Client()
+        client.get(menu_url)
+        if with_cart:
+            for item_id in item_ids:
+                client.post(reverse('myapp:add_to_cart', args=[item_id]))
+        return client
+
+    def staff():
+        client = Client()
+        client.force_login(owner)
+        return client
+
+    def menu(run_index):
+        client = Client()
+        return lambda: client.get(menu_url)
+
+    def add_to_cart(run_index):
+        client = customer()
+        return lambda: client.post(reverse('myapp:add_to_cart', args=[item_ids[0]]))
+
+    def view_cart(run_index):
+        client = customer(with_cart=True)
+        return lambda: client.get(reverse('myapp:view_cart'))
+
+    def checkout(run_index):
+        client = customer(with_cart=True)
+        return lambda: client.post(reverse('myapp:checkout'))
+
+    def staff_dashboard(run_index):
+        client = staff()
+        return lambda: client.get(reverse('myapp:staff_dashboard'))
+
+    def update_order_status(run_index):
+        client = staff()
+        url = reverse('myapp:update_order_status', args=[pending_order_ids[run_index], 'Completed'])
+        return lambda: client.post(url, {'expected': 'Preparing'}, HTTP_ACCEPT='application/json')
+
+    def generate_qr_code(run_index):
+        client = staff()
+        return lambda: client.get(reverse('myapp:generate_qr_code', args=['7']))
+
+    def profile_update(run_index):
+        client = staff()
+        return lambda: client.get(reverse('profile_update'))
+
+    return {
+        'menu': menu,
+        'add_to_cart': add_to_cart,
+        'view_cart': view_cart,
+        'checkout': checkout,
+        'staff_dashboard': staff_dashboard,
+        'update_order_status': update_order_status,
+        'generate_qr_code': generate_qr_code,
+        'profile_update': profile_update,
+    }
+
+
+def measure_views(scenarios, runs=20, warmup=2):
+    """Runs each scenario `warmup + runs` times and returns {name: metrics}.
+
+    Metrics are the worst query count, p50/p95 latency in milliseconds and the
+    largest response size in bytes, over the measured runs.
+    """
+    results = {}
+    for name, setup in scenarios.items():
+        queries, latencies, sizes = [], [], []
+        for run_index in range(warmup + runs):
+            make_request = setup(run_index)
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = make_request()
+                elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name} returned {response.status_code}")
+            if run_index >= warmup:
+                queries.append(len(ctx.captured_queries))
+                latencies.append(elapsed)
+                sizes.append(len(response.content))
+        results[name] = {
+            'queries': max(queries),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'bytes': max(sizes),
+        }
+    return results
+
+
+def compare_to_baseline(results, baseline, latency_tolerance=1.0, size_tolerance=0.1, latency_floor_ms=5.0):
+    """Returns a list of human readable regressions of `results` against `baseline` view metrics.
+
+    Any extra query is a regression. Latency and response size may grow by the
+    given fractions; latency differences under `latency_floor_ms` are noise.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if metrics['queries'] > expected['queries']:
+            regressions.append(f"{name}: {metrics['queries']} queries (baseline {expected['queries']})")
+        allowed_ms = expected['p95_ms'] * (1 + latency_tolerance)
+        if metrics['p95_ms'] > allowed_ms and metrics['p95_ms'] - expected['p95_ms'] > latency_floor_ms:
+            regressions.append(f"{name}: p95 {metrics['p95_ms']}ms (baseline {expected['p95_ms']}ms)")
+        if metrics['bytes'] > expected['bytes'] * (1 + size_tolerance):
+            regressions.append(f"{name}: {metrics['bytes']} bytes (baseline {expected['bytes']})")
+    return regressions
+
+
+def measure_status_updates(owner, orders=100):
+    """Times moving `orders` fresh orders Pending -> Preparing -> Completed three ways.
+
+    ``per_order_reload`` is the old flow: one request per order and status, each
+    followed by a full dashboard render. ``per_order_json`` is one request per
+    order answered with just the changed row. ``bulk`` is one bulk request per
+    status. Returns {name: {'requests', 'queries', 'seconds'}}.
+    """
+    client = Client()
+    client.force_login(owner)
+    batch_url = reverse('myapp:batch_update_order_status')
+
+    def per_order(follow, headers):
+        def run(order_ids):
+            for expected, status in (('Pending', 'Preparing'), ('Preparing', 'Completed')):
+                for order_id in order_ids:
+                    url = reverse('myapp:update_order_status', args=[order_id, status])
+                    yield client.post(url, {'expected': expected}, follow=follow, headers=headers)
+        return run
+
+    def bulk(order_ids):
+        for status in ('Preparing', 'Completed'):
+            yield client.post(batch_url, {'order_ids': order_ids, 'status': status}, headers={'Accept': 'application/json'})
+
+    flows = {
+        'per_order_reload': per_order(True, {}),
+        'per_order_json': per_order(False, {'Accept': 'application/json'}),
+        'bulk': bulk,
+    }
+    results = {}
+    for name, flow in flows.items():
+        order_ids = [order.id for order in seed_active_orders(owner, orders)]
+        requests = 0
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for response in flow(order_ids):
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{name} returned {response.status_code}")
+                requests += 1
+            elapsed = time.perf_counter() - start
+        if Order.objects.filter(id__in=order_ids, status='Completed').count() != orders:
+            raise RuntimeError(f"{name} did not complete every order")
+        results[name] = {'requests': requests, 'queries': len(ctx.captured_queries), 'seconds': round(elapsed, 3)}
+    return results
+
+
+def measure_menu_render(items=200, runs=20):
+    """Render time of menu.html for `items` cards without fragment caching, cold and warm.
+
+    ``uncached`` points the fragment cache at a DummyCache, ``cold`` clears it
+    before every render and ``warm`` renders with every card already cached.
+    Returns {name: {'p50_ms', 'p95_ms'}}. Must run inside scratch_database().
+    """
+    owner = seed_restaurant('bench-render-chef', items=items)
+    item_list = list(menu_queryset(owner.username))
+    request = RequestFactory().get(reverse('myapp:menu'))
+    context = {'item_list': item_list, 'table_number': '7'}
+    fragment_caches = {
+        'default': settings.CACHES['default'],
+        'template_fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                               'LOCATION': 'bench-template-fragments'},
+    }
+    dummy_caches = {**fragment_caches, 'template_fragments': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+    results = {}
+    for name, cache_settings, clear in (('uncached', dummy_caches, False), ('cold', fragment_caches, True),
+                                        ('warm', fragment_caches, False)):
+        with override_settings(CACHES=cache_settings):
+            render_to_string('myapp/menu.html', context, request)
+            latencies = []
+            for _ in range(runs):
+                if clear:
+                    caches['template_fragments'].clear()
+                start = time.perf_counter()
+                render_to_string('myapp/menu.html', context, request)
+                latencies.append(time.perf_counter() - start)
+        results[name] = {
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        }
+    return results
+
+
+_DISH_WORDS = ['paneer', 'masala', 'dosa', 'biryani', 'tikka', 'curry', 'naan', 'samosa', 'lassi', 'korma',
+               'vada', 'idli', 'chutney', 'tandoori', 'pulao', 'kulfi', 'halwa', 'pakora', 'raita', 'dal']
+
+
+def seed_large_menu(restaurants=100, items=50000, batch_size=5000):
+    """Bulk-inserts `items` available items over `restaurants` owners and rebuilds the search index."""
+    rng = random.Random(0)
+    owners = User.objects.bulk_create([
+        User(username=f'bench-menu-{r}', password='!') for r in range(restaurants)
+    ])
+    owner_ids = list(User.objects.filter(username__startswith='bench-menu-').values_list('id', flat=True))
+    for start in range(0, items, batch_size):
+        Item.objects.bulk_create([
+            Item(user_name_id=owner_ids[n % len(owner_ids)], item_name=f'{rng.choice(_DISH_WORDS).title()} {n}',
+                 item_description=' '.join(rng.sample(_DISH_WORDS, 4)), item_price=rng.randint(2, 40))
+            for n in range(start, min(start + batch_size, items))
+        ])
+    search.rebuild_index()
+    return owners
+
+
+def menu_search_scenarios():
+    """Root menu requests to benchmark: browsing, a deep page, searches and price filters."""
+    menu_url = reverse('myapp:menu')
+    last_id = Item.objects.order_by('-id').values_list('id', flat=True).first()
+    params = {
+        'browse': {},
+        'deep_page': {'after': last_id - 100},
+        'search_common': {'q': 'masala'},
+        'search_two_words': {'q': 'paneer tikka'},
+        'search_prefix': {'q': 'tand'},
+        'search_no_match': {'q': 'sushi'},
+        'price_range': {'min_price': 10, 'max_price': 12},
+        'search_and_price': {'q': 'dosa', 'max_price': 5},
+    }
+
+    def scenario(query):
+        def setup(run_index):
+            client = Client()
+            return lambda: client.get(menu_url, query)
+        return setup
+
+    return {name: scenario(query) for name, query in params.items()}
+
+
+def staff_page_queries(owner):
+    """Queries per staff page for a logged-in owner, as {page: (first request, repeat request)}.
+
+    The first request follows a fresh login; the repeat shows what every later
+    page view costs once caches are warm.
+    """
+    item = Item.objects.filter(user_name=owner).first()
+    pages = {
+        'index': reverse('myapp:index'),
+        'detail': reverse('myapp:detail', args=[item.id]),
+        'staff_dashboard': reverse('myapp:staff_dashboard'),
+        'import_items': reverse('myapp:import_items'),
+        'generate_qr_code': reverse('myapp:generate_qr_code', args=['7']),
+        'profile': reverse('profile'),
+        'profile_update': reverse('profile_update'),
+    }
+    results = {}
+    for name, url in pages.items():
+        client = Client()
+        client.login(username=owner.username, password='bench-pass-123')
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{name} returned {response.status_code}")
+            counts.append(len(ctx.captured_queries))
+        results[name] = tuple(counts)
+    return results
+
+
+def seed_paid_orders(owners, orders, hours=24 * 90, batch_size=5000):
+    """Bulk-inserts `orders` paid, completed orders without lines, spread over the owners and the past `hours`.
+
+    Only the order rows are written (revenue analytics never read the lines),
+    so millions of orders can be seeded in minutes. The revenue buckets are
+    left empty; rebuild them with analytics.rebuild().
+    """
+    rng = random.Random(0)
+    now = timezone.now()
+    # Orders sharing a timestamp; about one step per hour of history
+    step = max(1, orders // hours)
+    created = 0
+    while created < orders:
+        size = min(batch_size, orders - created)
+        with transaction.atomic():
+            batch = Order.objects.bulk_create([
+                Order(owner=owners[(created + n) % len(owners)], table_number=str(rng.randint(1, 30)),
+                      status='Completed', is_paid=True, total_price=Decimal(rng.randint(300, 6000)) / 100,
+                      line_count=1)
+                for n in range(size)
+            ])
+            # created_at is auto_now_add, so the backdating is a second step
+            for offset in range(0, size, step):
+                moment = now - timedelta(hours=(created + offset) * hours / orders)
+                first, last = batch[offset].id, batch[min(offset + step, size) - 1].id
+                Order.objects.filter(id__gte=first, id__lte=last).update(created_at=moment, updated_at=moment)
+        created += size
+
+
+def naive_revenue_series(owner, period, count):
+    """What a revenue chart costs without the buckets: an annotate(TruncHour/TruncDay) aggregate over the orders."""
+    starts = analytics.bucket_starts(period, count)
+    return list(Order.objects.filter(owner=owner, is_paid=True, created_at__gte=starts[0]).annotate(
+        start=analytics.PERIODS[period]('created_at'),
+    ).values('start').annotate(orders=Count('id'), revenue=Sum('total_price')).order_by('start'))
+
+
+def measure_revenue_series(owner, charts, runs=20):
+    """Times each chart, {name: (period, buckets)}, from the orders and from the buckets.
+
+    Returns {name: {'naive_ms': p50, 'buckets_ms': p50, 'match': bool}}.
+    """
+    results = {}
+    for name, (period, count) in charts.items():
+        timings = {}
+        for label, read in (('naive', naive_revenue_series), ('buckets', analytics.revenue_series)):
+            latencies = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = read(owner, period, count)
+                latencies.append(time.perf_counter() - start)
+            timings[label] = (percentile(latencies, 50) * 1000, result)
+        naive_rows, series = timings['naive'][1], timings['buckets'][1]
+        results[name] = {
+            'naive_ms': timings['naive'][0],
+            'buckets_ms': timings['buckets'][0],
+            'match': (
+                sum(row['orders'] for row in naive_rows) == series['total_orders']
+                and sum(Decimal(row['revenue']).quantize(analytics.CENT) for row in naive_rows) == Decimal(series['total_revenue'])
+            ),
+        }
+    return results
+
+
+def customer_flow(owner, lines=3):
+    """One customer's visit as a list of (method, url): scan the table QR, add `lines` dishes, review, check out."""
+    item_ids = list(Item.objects.filter(user_name=owner).values_list('id', flat=True)[:lines])
+    return (
+        [('get', reverse('myapp:menu_with_table', kwargs={'username': owner.username, 'table_id': '7'}))]
+        + [('post', reverse('myapp:add_to_cart', args=[item_id])) for item_id in item_ids]
+        + [('get', reverse('myapp:view_cart')), ('post', reverse('myapp:checkout'))]
+    )
+
+
+def _check_status(method, url, response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}")
+
+
+def load_test_wsgi(flow, customers, concurrency):
+    """Runs `customers` visits through Django's WSGI handler, `concurrency` at a time (one thread each).
+
+    Returns (wall_seconds, request_latencies, errors), errors being one per failed visit.
+    """
+    latencies = []
+
+    def visit(run_index):
+        client = Client()
+        for method, url in flow:
+            start = time.perf_counter()
+            response = getattr(client, method)(url)
+            latencies.append(time.perf_counter() - start)
+            _check_status(method, url, response)
+
+    wall, _, errors = hammer(visit, customers, concurrency)
+    return wall, latencies, errors
+
+
+def load_test_asgi(flow, customers, concurrency):
+    """Runs `customers` visits through Django's ASGI handler on one event loop, `concurrency` at a time.
+
+    Returns (wall_seconds, request_latencies, errors) like load_test_wsgi().
+    """
+    async def run():
+        latencies, errors = [], []
+        slots = asyncio.Semaphore(concurrency)
+
+        async def visit():
+            async with slots:
+                client = AsyncClient()
+                try:
+                    for method, url in flow:
+                        start = time.perf_counter()
+                        response = await getattr(client, method)(url)
+                        latencies.append(time.perf_counter() - start)
+                        _check_status(method, url, response)
+                except Exception as exc:  # noqa: BLE001 - failures are part of the measurement
+                    errors.append(exc)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(visit() for _ in range(customers)))
+        wall = time.perf_counter() - start
+        # The executor thread's connection, like hammer()'s per-thread cleanup
+        await sync_to_async(connections.close_all)()
+        return wall, latencies, errors
+
+    request_logger = logging.getLogger('django.request')
+    old_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        return asyncio.run(run())
+    finally:
+        request_logger.setLevel(old_level)
@@ -0,0 +1,108 @@
+# mysite/myapp/cart.py
+
+"""Compact customer cart kept in a signed cookie.
+
+The cart is just ``{item_id: quantity}``. Names, prices and descriptions are
+never copied into it; they are read from the current Item rows in one query
+when the cart is shown or checked out. Keeping it in a signed cookie instead of
+the session means tapping "Add to Cart" does not write the ``django_session``
+table.
+"""
+
+import json
+from decimal import Decimal
+
+from django.core import signing
+
+from .models import Item
+
+CART_COOKIE = 'cart'
+CART_SALT = 'myapp.cart'
+CART_MAX_AGE = 60 * 60 * 24
+# Keeps the cookie well under the 4KB browser limit
+MAX_CART_LINES = 100
+MAX_LINE_QUANTITY = 99
+CART_ITEM_FIELDS = ('id', 'user_name_id', 'item_name', 'item_description', 'item_price', 'is_available')
+
+
+def load_cart(request):
+    """Returns the cart as {item_id (str): quantity (int)}; an invalid or tampered cookie is an empty cart."""
+    try:
+        raw = request.get_signed_cookie(CART_COOKIE, salt=CART_SALT, max_age=CART_MAX_AGE)
+        data = json.loads(raw)
+    except (KeyError, signing.BadSignature, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {
+        str(item_id): int(quantity)
+        for item_id, quantity in data.items()
+        if str(item_id).isdigit() and isinstance(quantity, int) and quantity > 0
+    }
+
+
+def save_cart(response, cart):
+    """Writes the cart cookie on the response (or deletes it when the cart is empty)."""
+    if not cart:
+        response.delete_cookie(CART_COOKIE, samesite='Lax')
+        return response
+    response.set_signed_cookie(
+        CART_COOKIE, json.dumps(cart, separators=(',', ':')), salt=CART_SALT,
+        max_age=CART_MAX_AGE, httponly=True, samesite='Lax',
+    )
+    return response
+
+
+def add_item(cart, item_id, quantity=1):
+    """Adds to an item's quantity. Returns False if the cart is full."""
+    item_id = str(item_id)
+    if item_id not in cart and len(cart) >= MAX_CART_LINES:
+        return False
+    cart[item_id] = min(cart.get(item_id, 0) + quantity, MAX_LINE_QUANTITY)
+    return True
+
+
+def cart_items(cart, fields=CART_ITEM_FIELDS):
+    """Fetches every Item referenced by the cart in one query, as {id: Item}."""
+    if not cart:
+        return {}
+    return Item.objects.only(*fields).in_bulk([int(item_id) for item_id in cart])
+
+
+async def acart_items(cart, fields=CART_ITEM_FIELDS):
+    """Async version of cart_items()."""
+    if not cart:
+        return {}
+    return await Item.objects.only(*fields).ain_bulk([int(item_id) for item_id in cart])
+
+
+def hydrate_cart(cart):
+    """Returns (lines, total) for display, skipping items that no longer exist.
+
+    Each line is a dict with id, name, description, price (Decimal), quantity and line_total.
+    """
+    return _cart_lines(cart, cart_items(cart))
+
+
+async def ahydrate_cart(cart):
+    """Async version of hydrate_cart()."""
+    return _cart_lines(cart, await acart_items(cart))
+
+
+def _cart_lines(cart, items):
+    lines = []
+    for item_id, quantity in cart.items():
+        item = items.get(int(item_id))
+        if item is None:
+            continue
+        price = Decimal(item.item_price)
+        lines.append({
+            'id': item.id,
+            'name': item.item_name,
+            'description': item.item_description,
+            'price': price,
+            'quantity': quantity,
+            'line_total': price * quantity,
+            'is_available': item.is_available,
+        })
+    return lines, sum((line['line_total'] for line in lines), Decimal('0'))
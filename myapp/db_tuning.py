@@ -0,0 +1,24 @@
+# mysite/myapp/db_tuning.py
+
+"""Applies settings.SQLITE_PRAGMAS (see mysite/db_profiles.py) to each new SQLite connection.
+
+Only per-connection PRAGMAs belong here. The journal mode is stored in the
+database file and is set by the ``sqlite_journal_mode`` command.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+connection_created.connect(apply_sqlite_pragmas)
@@ -0,0 +1,102 @@
+# mysite/myapp/events.py
+
+"""Order event broker for the live kitchen feed.
+
+Views publish order events (created / status changed) per restaurant owner and
+the ``order_events`` Server-Sent Events view streams them to open dashboards.
+The broker class is chosen by the ``ORDER_EVENTS_BROKER`` setting. The default
+``InProcessBroker`` only reaches dashboards connected to the same process, so a
+deployment running several ASGI workers needs a backend built on a shared
+pub/sub channel (e.g. Redis) implementing the same three methods.
+"""
+
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    def subscribe(self, owner_id):
+        """Returns an asyncio.Queue that receives events for this owner. Call from the event loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, owner_id, queue):
+        raise NotImplementedError
+
+    def publish(self, owner_id, event):
+        """Delivers an event to every subscriber of this owner. Safe to call from any thread."""
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    # Slow or stalled dashboards drop events rather than growing memory without bound
+    MAX_QUEUED_EVENTS = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, owner_id):
+        queue = asyncio.Queue(self.MAX_QUEUED_EVENTS)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(owner_id, {})[queue] = loop
+        return queue
+
+    def unsubscribe(self, owner_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(owner_id, {})
+            subscribers.pop(queue, None)
+            if not subscribers:
+                self._subscribers.pop(owner_id, None)
+
+    def publish(self, owner_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(owner_id, {}).items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # The subscriber's event loop has been closed
+                self.unsubscribe(owner_id, queue)
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'ORDER_EVENTS_BROKER', 'myapp.events.InProcessBroker'))()
+
+
+def order_payload(order, lines=None):
+    payload = {
+        'id': order.id,
+        'table_number': order.table_number,
+        'status': order.status,
+        'is_paid': order.is_paid,
+        'total_price': str(order.total_price),
+        'line_count': order.line_count,
+        'item_summary': order.item_summary,
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+    }
+    if lines is not None:
+        payload['items'] = [{'item_name': line.item_name, 'quantity': line.quantity} for line in lines]
+    return payload
+
+
+def publish_order_event(order, event_type, lines=None, **extra):
+    """Publishes an order event to the order's restaurant once the current transaction commits."""
+    if order.owner_id is None:
+        return
+    event = {'type': event_type, 'order': order_payload(order, lines), **extra}
+    owner_id = order.owner_id
+    transaction.on_commit(lambda: get_broker().publish(owner_id, event))
@@ -1,8 +1,40 @@
 from django import forms
+from mysite.images import decode_data_uri, open_image
 from .models import Item
 
 class ItemForm(forms.ModelForm):
+    # Bulk imports upsert by name, so they skip the per-row duplicate check
+    check_unique_name = True
+
     class Meta:
         model = Item
         # ADD 'is_available'
-        fields = ['item_name', 'item_description', 'item_price', 'item_image', 'is_available']
\ No newline at end of file
+        fields = ['item_name', 'item_description', 'item_price', 'item_image', 'is_available']
+
+    def clean_item_name(self):
+        # NEW: (owner, name) is unique, but the owner isn't a form field so Django won't check it
+        item_name = self.cleaned_data['item_name']
+        if self.check_unique_name and Item.objects.filter(
+            user_name_id=self.instance.user_name_id, item_name=item_name
+        ).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError("You already have an item with this name.")
+        return item_name
+
+    def clean_item_image(self):
+        # NEW: An inline data-URI is stored as a file on save, so it must hold an image we can decode
+        item_image = self.cleaned_data['item_image']
+        if item_image.startswith('data:'):
+            data = decode_data_uri(item_image)
+            if data is None:
+                raise forms.ValidationError("The image must be a base64 data URI.")
+            try:
+                open_image(data)
+            except ValueError as error:
+                raise forms.ValidationError(str(error))
+        return item_image
+
+class ItemImportForm(ItemForm):
+    check_unique_name = False
+
+class ItemImportUploadForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or JSON Lines (one object per line).")
@@ -0,0 +1,187 @@
+# mysite/myapp/instrumentation.py
+
+"""Per-request SQL and timing instrumentation with a slow-request log.
+
+``RequestInstrumentationMiddleware`` times every request. For a sampled
+fraction of requests (``SAMPLE_RATE``) it also counts and times each SQL query
+and groups queries by fingerprint: the SQL text with parameters already
+factored out and ``IN (...)`` lists collapsed. An N+1 shows up as one
+fingerprint repeated many times. Requests slower than ``SLOW_MS`` are written
+as one JSON object per line to a size-rotated log, which the
+``slow_request_report`` command aggregates into a hot-view report.
+
+Queries are collected through a context variable rather than a per-thread
+connection wrapper. That way ORM calls made from ``sync_to_async`` threads by
+async views are attributed to the right request too.
+"""
+
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+DEFAULTS = {
+    'SAMPLE_RATE': 1.0,
+    'SLOW_MS': 500,
+    'LOG_FILE': None,
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+    'TOP_FINGERPRINTS': 5,
+}
+
+_collector = ContextVar('request_sql_collector', default=None)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+_SAVEPOINT = re.compile(r'(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT) "[^"]+"')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_INSTRUMENTATION', {})}
+
+
+def fingerprint(sql):
+    """Normalises a parameterised SQL string so repeats of the same query compare equal."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _SAVEPOINT.sub(r'\1 ?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryCollector:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.fingerprint_seconds = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            key = fingerprint(sql)
+            self.count += 1
+            self.seconds += elapsed
+            self.fingerprints[key] += 1
+            self.fingerprint_seconds[key] += elapsed
+
+    def repeated(self, limit):
+        """The most repeated fingerprints (seen more than once), most frequent first."""
+        return [
+            {'sql': sql[:300], 'count': count, 'ms': round(self.fingerprint_seconds[sql] * 1000, 2)}
+            for sql, count in self.fingerprints.most_common(limit)
+            if count > 1
+        ]
+
+
+def _record_query(execute, sql, params, many, context):
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    return collector(execute, sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+# Covers connections opened later in any thread, including sync_to_async workers
+connection_created.connect(_install)
+
+_slow_log_handlers = {}
+slow_request_logger = logging.getLogger('myapp.slow_requests')
+
+
+def get_slow_log_handler(path, max_bytes, backup_count):
+    """The rotating JSONL handler for a log file, shared by every middleware instance."""
+    path = Path(path)
+    if path not in _slow_log_handlers:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _slow_log_handlers[path] = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+    return _slow_log_handlers[path]
+
+
+class RequestInstrumentationMiddleware:
+    """Measures wall time (always) and SQL (sampled) per request; logs slow requests."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        self.handler = None
+        if self.config['LOG_FILE']:
+            self.handler = get_slow_log_handler(
+                self.config['LOG_FILE'], self.config['MAX_BYTES'], self.config['BACKUP_COUNT'],
+            )
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections already open in this thread predate the connection_created hook
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        collector, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+        self._finish(request, response, collector, start)
+        return response
+
+    async def __acall__(self, request):
+        collector, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+        self._finish(request, response, collector, start)
+        return response
+
+    def _start(self):
+        sampled = random.random() < self.config['SAMPLE_RATE']
+        collector = QueryCollector() if sampled else None
+        return collector, _collector.set(collector), time.perf_counter()
+
+    def _finish(self, request, response, collector, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+        # Streaming responses are timed up to the first byte; the stream itself isn't
+        if wall_ms < self.config['SLOW_MS']:
+            return
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'ts': timezone.now().isoformat(),
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'wall_ms': round(wall_ms, 2),
+            'sampled': collector is not None,
+        }
+        if collector is not None:
+            record.update({
+                'sql_count': collector.count,
+                'sql_ms': round(collector.seconds * 1000, 2),
+                'repeated': collector.repeated(self.config['TOP_FINGERPRINTS']),
+            })
+        if self.handler is None:
+            # No LOG_FILE: leave routing to the LOGGING setting
+            slow_request_logger.info(json.dumps(record))
+        else:
+            self.handler.handle(logging.makeLogRecord({'msg': json.dumps(record), 'levelno': logging.INFO}))
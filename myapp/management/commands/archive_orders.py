@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp import order_history, rollups
+
+
+class Command(BaseCommand):
+    help = ("Moves completed and cancelled orders older than N days into the archive tables. "
+            "The sales rollup is unchanged; use --verify to check it against live + archived history.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=90)
+        parser.add_argument('--owner', action='append', dest='owners', metavar='USERNAME',
+                            help="Only archive this restaurant's orders (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Orders moved per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the orders that would move.")
+        parser.add_argument('--verify', action='store_true', help="Verify the sales rollup afterwards.")
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] < 1:
+            raise CommandError("--older-than-days must be at least 1.")
+        owner_ids = None
+        if options['owners']:
+            owner_ids = list(User.objects.filter(username__in=options['owners']).values_list('id', flat=True))
+            if len(owner_ids) != len(set(options['owners'])):
+                raise CommandError("Unknown owner username in --owner.")
+
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        if options['dry_run']:
+            count = order_history.archivable_orders(cutoff, owner_ids).count()
+            self.stdout.write(f"{count} orders created before {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+
+        start = time.perf_counter()
+        moved = order_history.archive_orders(cutoff, owner_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} orders created before {cutoff:%Y-%m-%d %H:%M} in {time.perf_counter() - start:.1f}s."
+        ))
+
+        if options['verify']:
+            mismatches = rollups.verify(owner_ids)
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} rollup mismatches after archiving.")
+            self.stdout.write(self.style.SUCCESS("Rollup matches live + archived order history."))
@@ -0,0 +1,68 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client
+from django.urls import reverse
+
+from myapp.benchmarking import hammer, scratch_database, seed_restaurant, summary
+from myapp.models import Item, Order
+
+
+class Command(BaseCommand):
+    help = "Hammers checkout from many threads against a throwaway database and checks the resulting totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--lines', type=int, default=5, help="Distinct items per cart.")
+        parser.add_argument('--journal-mode', default=None,
+                            help="Override the SQLite journal mode of the scratch database (wal, delete, ...); "
+                                 "defaults to the DB_PROFILE's.")
+
+    def handle(self, *args, **options):
+        lines = options['lines']
+        with scratch_database(journal_mode=options['journal_mode'] or settings.SQLITE_JOURNAL_MODE):
+            owner = seed_restaurant('bench-chef', items=max(lines, 20))
+            item_ids = list(Item.objects.filter(user_name=owner).values_list('id', flat=True)[:lines])
+            menu_url = reverse('myapp:menu_with_table', kwargs={'username': owner.username, 'table_id': '1'})
+
+            def place_order(run_index):
+                client = Client()
+                client.get(menu_url)
+                for item_id in item_ids:
+                    client.get(reverse('myapp:add_to_cart', args=[item_id]))
+                # Only the checkout POST is timed
+                start = time.perf_counter()
+                response = client.post(reverse('myapp:checkout'))
+                elapsed = time.perf_counter() - start
+                if response.status_code != 200:
+                    raise RuntimeError(f"checkout returned {response.status_code}")
+                return elapsed
+
+            journal_mode = '-'
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal_mode = cursor.fetchone()[0]
+            wall, latencies, errors = hammer(place_order, options['orders'], options['threads'])
+            self.stdout.write(summary(
+                f"[{settings.DB_PROFILE}] checkout x{options['orders']} ({options['threads']} threads, {lines} lines, "
+                f"{connection.vendor}, journal_mode={journal_mode}, "
+                f"conn_max_age={connection.settings_dict['CONN_MAX_AGE']}, "
+                f"pool={'pool' in connection.settings_dict['OPTIONS']})", wall, latencies, errors,
+            ))
+            for error in {str(error) for error in errors}:
+                self.stderr.write(f"  error: {error}")
+
+            expected_total = sum(Decimal(price) for price in Item.objects.filter(id__in=item_ids).values_list('item_price', flat=True))
+            orders = Order.objects.filter(owner=owner)
+            if orders.count() != len(latencies):
+                raise CommandError(f"{orders.count()} orders written for {len(latencies)} successful checkouts.")
+            if orders.exclude(total_price=expected_total).exists():
+                raise CommandError("Some orders have totals that don't match current item prices.")
+            total = orders.aggregate(total=Sum('total_price'))['total'] or 0
+            self.stdout.write(self.style.SUCCESS(f"Totals consistent: {orders.count()} orders, ${total}."))
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mysite.db_profiles import PROFILES
+
+
+class Command(BaseCommand):
+    help = ("Runs the bench_checkout load test once per database profile (DB_PROFILE), each in its own "
+            "process, so checkout throughput can be compared across SQLite setups and PostgreSQL.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=None,
+                            help="Comma separated DB_PROFILE names (default: sqlite-basic,sqlite, "
+                                 "plus postgres when DATABASE_HOST is set).")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--lines', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['profiles']:
+            profiles = options['profiles'].split(',')
+        else:
+            profiles = ['sqlite-basic', 'sqlite'] + (['postgres'] if os.environ.get('DATABASE_HOST') else [])
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        manage_py = settings.BASE_DIR / 'manage.py'
+        failed = []
+        for profile in profiles:
+            result = subprocess.run(
+                [sys.executable, str(manage_py), 'bench_checkout',
+                 '--threads', str(options['threads']), '--orders', str(options['orders']),
+                 '--lines', str(options['lines'])],
+                env={**os.environ, 'DB_PROFILE': profile}, capture_output=True, text=True,
+            )
+            self.stdout.write(result.stdout.rstrip())
+            if result.returncode:
+                failed.append(profile)
+                self.stderr.write(result.stderr.rstrip())
+        if failed:
+            raise CommandError(f"bench_checkout failed for: {', '.join(failed)}")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from myapp.benchmarking import measure_menu_render, scratch_database
+
+
+class Command(BaseCommand):
+    help = "Measures menu.html render time for a large menu with and without per-item card fragment caching."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200)
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            results = measure_menu_render(options['items'], options['runs'])
+        self.stdout.write(f"menu.html with {options['items']} items, {options['runs']} renders each")
+        self.stdout.write(f"{'fragments':<12}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, metrics in results.items():
+            self.stdout.write(f"{name:<12}{metrics['p50_ms']:>10.2f}{metrics['p95_ms']:>10.2f}")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.benchmarking import measure_views, menu_search_scenarios, scratch_database, seed_large_menu
+
+
+class Command(BaseCommand):
+    help = "Seeds a large multi-restaurant menu and measures root menu browsing, search and price filtering."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=100)
+        parser.add_argument('--items', type=int, default=50000)
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            start = time.perf_counter()
+            seed_large_menu(options['restaurants'], options['items'])
+            self.stdout.write(f"Seeded {options['items']} items in {time.perf_counter() - start:.1f}s.")
+            results = measure_views(menu_search_scenarios(), runs=options['runs'], warmup=2)
+
+        self.stdout.write(f"{'request':<20}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'bytes':>10}")
+        for name, metrics in results.items():
+            self.stdout.write(
+                f"{name:<20}{metrics['queries']:>8}{metrics['p50_ms']:>10.2f}{metrics['p95_ms']:>10.2f}{metrics['bytes']:>10}"
+            )
@@ -0,0 +1,48 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import analytics
+from myapp.benchmarking import measure_revenue_series, scratch_database, seed_paid_orders
+
+CHARTS = {
+    'last 24 hours': ('hour', 24),
+    'last 30 days': ('day', 30),
+    'last year': ('day', 366),
+}
+
+
+class Command(BaseCommand):
+    help = ("Seeds paid orders and compares revenue charts read from the hourly/daily revenue buckets "
+            "with the same series aggregated from the orders with annotate(TruncHour/TruncDay).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--restaurants', type=int, default=10)
+        parser.add_argument('--days', type=int, default=365, help="Days of history the orders are spread over.")
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            owners = User.objects.bulk_create([
+                User(username=f'bench-chef-{n}') for n in range(options['restaurants'])
+            ])
+            start = time.perf_counter()
+            seed_paid_orders(owners, options['orders'], hours=options['days'] * 24)
+            self.stdout.write(f"Seeded {options['orders']} orders in {time.perf_counter() - start:.1f}s.")
+
+            start = time.perf_counter()
+            buckets = analytics.rebuild()
+            self.stdout.write(f"Backfilled {buckets} revenue buckets in {time.perf_counter() - start:.1f}s.")
+            results = measure_revenue_series(owners[0], CHARTS, runs=options['runs'])
+
+        self.stdout.write(f"{'chart (one restaurant)':<24}{'naive ms':>10}{'buckets ms':>12}{'speedup':>9}")
+        for name, metrics in results.items():
+            speedup = metrics['naive_ms'] / metrics['buckets_ms'] if metrics['buckets_ms'] else 0
+            self.stdout.write(
+                f"{name:<24}{metrics['naive_ms']:>10.2f}{metrics['buckets_ms']:>12.2f}{speedup:>8.0f}x"
+            )
+        mismatched = [name for name, metrics in results.items() if not metrics['match']]
+        if mismatched:
+            raise CommandError(f"Bucket series differ from the raw aggregate for: {', '.join(mismatched)}")
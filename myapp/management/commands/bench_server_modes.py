@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.benchmarking import (
+    customer_flow, load_test_asgi, load_test_wsgi, percentile, scratch_database, seed_restaurant,
+)
+from myapp.models import Order
+
+# mode: (handler, ASYNC_CUSTOMER_VIEWS)
+MODES = {
+    'wsgi': ('WSGI', '0'),
+    'asgi-sync': ('ASGI', '0'),
+    'asgi': ('ASGI', '1'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Load-tests the customer ordering flow (menu, add to cart, cart, checkout) through the WSGI "
+            "handler with the sync views and through the ASGI handler with the sync and the async views, "
+            "each in its own process on the same machine, and compares requests/sec and p99 latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='wsgi,asgi-sync,asgi',
+                            help="Comma separated: wsgi, asgi-sync (sync views under ASGI), asgi.")
+        parser.add_argument('--customers', type=int, default=200, help="Customer visits per mode.")
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="Visits in flight at once (threads for WSGI, tasks for ASGI).")
+        parser.add_argument('--lines', type=int, default=3, help="Dishes added per visit.")
+        parser.add_argument('--run', choices=sorted(MODES), help="Internal: run one mode in this process.")
+
+    def handle(self, *args, **options):
+        if options['run']:
+            return self.run_mode(options['run'], options)
+
+        modes = options['modes'].split(',')
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        manage_py = settings.BASE_DIR / 'manage.py'
+        failed = []
+        for mode in modes:
+            # The URLconf picks sync or async customer views at import time, hence a process per mode
+            result = subprocess.run(
+                [sys.executable, str(manage_py), 'bench_server_modes', '--run', mode,
+                 '--customers', str(options['customers']), '--concurrency', str(options['concurrency']),
+                 '--lines', str(options['lines'])],
+                env={**os.environ, 'ASYNC_CUSTOMER_VIEWS': MODES[mode][1]}, capture_output=True, text=True,
+            )
+            self.stdout.write(result.stdout.rstrip())
+            if result.returncode:
+                failed.append(mode)
+                self.stderr.write(result.stderr.rstrip())
+        if failed:
+            raise CommandError(f"Load test failed for: {', '.join(failed)}")
+
+    def run_mode(self, mode, options):
+        handler, async_views = MODES[mode]
+        if settings.ASYNC_CUSTOMER_VIEWS != (async_views == '1'):
+            raise CommandError(f"Run with ASYNC_CUSTOMER_VIEWS={async_views} for {mode}.")
+        load_test = load_test_asgi if handler == 'ASGI' else load_test_wsgi
+        with scratch_database():
+            owner = seed_restaurant('bench-chef', items=max(options['lines'], 20))
+            flow = customer_flow(owner, options['lines'])
+            # One untimed visit warms the template and menu caches
+            load_test(flow, 1, 1)
+            wall, latencies, errors = load_test(flow, options['customers'], options['concurrency'])
+            self.stdout.write(
+                f"[{mode}] {handler} + {'async' if async_views == '1' else 'sync'} views, "
+                f"{options['customers']} visits x {len(flow)} requests ({options['concurrency']} concurrent, "
+                f"{settings.DB_PROFILE}): {len(latencies)} requests in {wall:.2f}s "
+                f"({len(latencies) / wall if wall else 0:.1f} req/s), p50 {percentile(latencies, 50) * 1000:.1f}ms, "
+                f"p99 {percentile(latencies, 99) * 1000:.1f}ms, {len(errors)} failed visits"
+            )
+            for error in {str(error) for error in errors}:
+                self.stderr.write(f"  error: {error}")
+            orders = Order.objects.filter(owner=owner).count()
+            if orders != options['customers'] + 1 - len(errors):
+                raise CommandError(f"{orders} orders written for {options['customers'] + 1 - len(errors)} visits.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from myapp.benchmarking import scratch_database, scratch_media, seed_restaurant, seed_active_orders, staff_page_queries
+
+
+class Command(BaseCommand):
+    help = "Counts the SQL queries of each staff page for a logged-in restaurant owner."
+
+    def handle(self, *args, **options):
+        with scratch_database(), scratch_media():
+            owner = seed_restaurant('bench-chef', items=20)
+            seed_active_orders(owner, 10)
+            results = staff_page_queries(owner)
+
+        self.stdout.write(f"{'page':<20}{'first':>8}{'repeat':>8}")
+        for name, (first, repeat) in results.items():
+            self.stdout.write(f"{name:<20}{first:>8}{repeat:>8}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from myapp import rollups
+from myapp.benchmarking import measure_status_updates, scratch_database, seed_order_history, seed_restaurant
+
+
+class Command(BaseCommand):
+    help = ("Moves N orders through the kitchen workflow one request per order (with and without a "
+            "dashboard reload) and with bulk actions, against a throwaway database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100, help="Active orders to move.")
+        parser.add_argument('--history', type=int, default=20000, help="Historical orders seeded first.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            owner = seed_restaurant('bench-chef', items=50)
+            seed_order_history([owner], options['history'])
+            results = measure_status_updates(owner, options['orders'])
+            mismatches = rollups.verify()
+
+        self.stdout.write(f"{options['orders']} orders, Pending -> Preparing -> Completed")
+        self.stdout.write(f"{'flow':<20}{'requests':>10}{'queries':>10}{'seconds':>10}")
+        for name, metrics in results.items():
+            self.stdout.write(f"{name:<20}{metrics['requests']:>10}{metrics['queries']:>10}{metrics['seconds']:>10.3f}")
+        if mismatches:
+            self.stderr.write(f"{len(mismatches)} rollup mismatches")
+        else:
+            self.stdout.write(self.style.SUCCESS("Rollup matches order history."))
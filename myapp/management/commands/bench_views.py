@@ -0,0 +1,69 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.benchmarking import (
+    compare_to_baseline, measure_views, scratch_database, scratch_media, seed_view_benchmark, view_scenarios,
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'bench_baseline.json'
+
+
+class Command(BaseCommand):
+    help = ("Seeds a throwaway database, measures query count, latency and response size for every "
+            "customer, staff and profile view, and fails if any regressed against the stored baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=5)
+        parser.add_argument('--items', type=int, default=50, help="Menu items per restaurant.")
+        parser.add_argument('--orders', type=int, default=20000, help="Historical orders across all restaurants.")
+        parser.add_argument('--runs', type=int, default=20, help="Measured requests per view.")
+        parser.add_argument('--warmup', type=int, default=2, help="Unmeasured requests per view (fill caches).")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help="Write the results as the new baseline instead of comparing.")
+        parser.add_argument('--latency-tolerance', type=float, default=1.0,
+                            help="Allowed p95 growth as a fraction of the baseline (default 1.0 = 2x).")
+
+    def handle(self, *args, **options):
+        params = {key: options[key] for key in ('restaurants', 'items', 'orders', 'runs')}
+        baseline_path = Path(options['baseline'])
+        baseline = None
+        if not options['update_baseline']:
+            if not baseline_path.exists():
+                raise CommandError(f"No baseline at {baseline_path}; run with --update-baseline first.")
+            baseline = json.loads(baseline_path.read_text())
+            if baseline['params'] != params:
+                raise CommandError(
+                    f"Baseline was recorded with {baseline['params']}, not {params}. "
+                    "Use the same options or --update-baseline."
+                )
+
+        with scratch_database(), scratch_media():
+            start = time.perf_counter()
+            owners, pending_order_ids = seed_view_benchmark(
+                options['restaurants'], options['items'], options['orders'],
+                pending=options['warmup'] + options['runs'],
+            )
+            self.stdout.write(f"Seeded {params} in {time.perf_counter() - start:.1f}s.")
+            results = measure_views(view_scenarios(owners[0], pending_order_ids), options['runs'], options['warmup'])
+
+        self.stdout.write(f"{'view':<22}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'bytes':>10}")
+        for name, metrics in results.items():
+            self.stdout.write(
+                f"{name:<22}{metrics['queries']:>8}{metrics['p50_ms']:>10.2f}{metrics['p95_ms']:>10.2f}{metrics['bytes']:>10}"
+            )
+
+        if options['update_baseline']:
+            baseline_path.write_text(json.dumps({'params': params, 'views': results}, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}."))
+            return
+
+        regressions = compare_to_baseline(results, baseline['views'], options['latency_tolerance'])
+        for regression in regressions:
+            self.stderr.write(f"  regression: {regression}")
+        if regressions:
+            raise CommandError(f"{len(regressions)} performance regressions against {baseline_path}.")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,40 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import qr
+
+
+class Command(BaseCommand):
+    help = "Renders the QR codes for a restaurant's tables into a printable PDF or a ZIP of images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('owner', metavar='USERNAME', help="Restaurant owner the menu links point at.")
+        parser.add_argument('--tables', required=True, help='Tables to render, e.g. "1-40,Patio".')
+        parser.add_argument('--base-url', required=True, help='Site the codes link to, e.g. "https://food.example.com".')
+        parser.add_argument('--export', choices=['pdf', 'zip'], default='pdf')
+        parser.add_argument('--format', choices=sorted(qr.FORMATS), default='png', dest='fmt',
+                            help="Image format inside a ZIP export (PDF pages are always rendered from PNG).")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Render processes (default: one per CPU).")
+        parser.add_argument('--output', '-o', required=True, help="File to write.")
+
+    def handle(self, *args, **options):
+        if not User.objects.filter(username=options['owner']).exists():
+            raise CommandError(f"Unknown owner {options['owner']!r}.")
+        try:
+            tables = qr.parse_tables(options['tables'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        start = time.perf_counter()
+        data = qr.build_sheet(
+            options['base_url'], options['owner'], tables,
+            export=options['export'], fmt=options['fmt'], workers=options['workers'],
+        )
+        with open(options['output'], 'wb') as output:
+            output.write(data)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(tables)} table codes to {options['output']} in {time.perf_counter() - start:.2f}s."
+        ))
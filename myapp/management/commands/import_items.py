@@ -0,0 +1,51 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import menu_io
+
+
+class Command(BaseCommand):
+    help = "Bulk-imports menu items for a restaurant from a CSV or JSON Lines file, updating items by name."
+
+    def add_arguments(self, parser):
+        parser.add_argument('owner', metavar='USERNAME', help="Restaurant owner whose menu is imported into.")
+        parser.add_argument('path', help="CSV (with a header row) or .jsonl file.")
+        parser.add_argument('--format', choices=sorted(menu_io.FORMATS), dest='fmt',
+                            help="Default: from the file extension.")
+        parser.add_argument('--batch-size', type=int, default=menu_io.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Validate every row without writing.")
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown owner {options['owner']!r}.")
+
+        if not options['dry_run'] and isinstance(caches['shared'], LocMemCache):
+            # The new menu version would only reach this process's cache
+            self.stderr.write(self.style.WARNING(
+                "CACHES['shared'] is process-local: a running server keeps showing the old menu "
+                "until its cache expires. Configure a shared backend (see settings.py)."
+            ))
+
+        start = time.perf_counter()
+        with open(options['path'], 'rb') as source:
+            result = menu_io.import_file(
+                owner, source, options['fmt'] or menu_io.detect_format(options['path']),
+                batch_size=options['batch_size'], dry_run=options['dry_run'],
+            )
+
+        for line_number, errors in result['errors']:
+            details = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in errors.items())
+            self.stderr.write(f"  line {line_number}: {details}")
+        verb = "Validated" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['imported']} items, skipped {result['failed']} rows "
+            f"in {time.perf_counter() - start:.2f}s."
+        ))
+        if result['failed']:
+            raise CommandError(f"{result['failed']} rows had errors.")
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import analytics
+
+
+class Command(BaseCommand):
+    help = ("Rebuilds the hourly and daily RevenueBucket rows from order history and verifies them "
+            "against the raw TruncHour/TruncDay aggregate.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', action='append', dest='owners', metavar='USERNAME',
+                            help="Only rebuild/verify this restaurant owner (repeatable).")
+        parser.add_argument('--verify-only', action='store_true',
+                            help="Compare the existing buckets with the raw aggregate without rebuilding.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        owner_ids = None
+        if options['owners']:
+            owner_ids = list(User.objects.filter(username__in=options['owners']).values_list('id', flat=True))
+            if len(owner_ids) != len(set(options['owners'])):
+                raise CommandError("Unknown owner username in --owner.")
+
+        if not options['verify_only']:
+            created = analytics.rebuild(owner_ids, batch_size=options['batch_size'])
+            self.stdout.write(f"Rebuilt {created} revenue buckets.")
+
+        mismatches = analytics.verify(owner_ids)
+        for owner_id, period, start, expected, actual in mismatches:
+            self.stderr.write(
+                f"owner={owner_id} {period}={start.isoformat()}: expected orders={expected[0]} "
+                f"revenue={expected[1]}, bucket orders={actual[0]} revenue={actual[1]}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} revenue bucket mismatches found.")
+        self.stdout.write(self.style.SUCCESS("Revenue buckets match the raw order aggregate."))
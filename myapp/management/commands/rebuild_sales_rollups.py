@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the ItemSalesDaily rollup from order history and verifies it against the raw aggregate."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', action='append', dest='owners', metavar='USERNAME',
+                            help="Only rebuild/verify this restaurant owner (repeatable).")
+        parser.add_argument('--verify-only', action='store_true',
+                            help="Compare the existing rollup with the raw aggregate without rebuilding.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        owner_ids = None
+        if options['owners']:
+            owner_ids = list(User.objects.filter(username__in=options['owners']).values_list('id', flat=True))
+            if len(owner_ids) != len(set(options['owners'])):
+                raise CommandError("Unknown owner username in --owner.")
+
+        if not options['verify_only']:
+            created = rollups.rebuild(owner_ids, batch_size=options['batch_size'])
+            self.stdout.write(f"Rebuilt {created} rollup rows.")
+
+        mismatches = rollups.verify(owner_ids)
+        for (owner_id, item_name, day), expected, actual in mismatches:
+            self.stderr.write(
+                f"owner={owner_id} item={item_name!r} day={day}: expected qty={expected[0]} revenue={expected[1]}, "
+                f"rollup qty={actual[0]} revenue={actual[1]}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} rollup mismatches found.")
+        self.stdout.write(self.style.SUCCESS("Rollup matches the raw order aggregate."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from myapp import search
+
+
+class Command(BaseCommand):
+    help = "Refills the menu search index (SQLite FTS5) from the Item table, e.g. after raw SQL or bulk loads."
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} items."))
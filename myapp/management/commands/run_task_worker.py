@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+
+from myapp import tasks
+from myapp.models import Task
+
+
+class Command(BaseCommand):
+    help = ("Runs queued background tasks (exports, QR sheets, profile pictures) in a pool of worker "
+            "processes, polling the Task table for new work.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (default: one per core); 0 runs tasks in this process.")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds between polls of an empty queue.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument('--purge-days', type=int, default=7,
+                            help="Delete finished tasks and their files older than this at startup.")
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0:
+            raise CommandError("--processes can't be negative.")
+        requeued = tasks.requeue_stale()
+        purged = tasks.purge(options['purge_days'])
+        self.stdout.write(f"Requeued {requeued} stale tasks, purged {purged} finished tasks.")
+
+        # Ids of the tasks this worker is running, whose leases keep_leases() renews
+        self.running = set()
+        stop = threading.Event()
+        keeper = threading.Thread(target=self.keep_leases, args=(stop,), daemon=True)
+        keeper.start()
+        try:
+            if not options['processes']:
+                done = self.run_inline(options)
+            else:
+                # spawn, not fork: each worker starts clean and calls django.setup() itself
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(options['processes'], mp_context=context, initializer=django.setup) as pool:
+                    done = self.run_pool(pool, options)
+        finally:
+            stop.set()
+            keeper.join()
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} tasks."))
+
+    def keep_leases(self, stop):
+        """Heartbeats this worker's running tasks and requeues stale ones, until `stop` is set.
+
+        Runs in its own thread, so leases are renewed while a task runs inline too.
+        """
+        try:
+            while not stop.wait(tasks.HEARTBEAT_EVERY):
+                try:
+                    tasks.heartbeat(self.running.copy())
+                    requeued = tasks.requeue_stale()
+                except DatabaseError as exc:
+                    self.stderr.write(f"Heartbeat failed: {exc!r}")
+                    continue
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale tasks.")
+        finally:
+            connection.close()
+
+    def report(self, task_id, status):
+        self.stdout.write(f"Task #{task_id}: {status}")
+
+    def run_inline(self, options):
+        done = 0
+        while True:
+            task_ids = tasks.claim(1)
+            if not task_ids:
+                if options['once']:
+                    return done
+                close_old_connections()
+                time.sleep(options['poll'])
+                continue
+            self.running.add(task_ids[0])
+            try:
+                self.report(task_ids[0], tasks.run_task(task_ids[0]))
+            finally:
+                self.running.discard(task_ids[0])
+            done += 1
+
+    def run_pool(self, pool, options):
+        done = 0
+        running = {}
+        try:
+            while True:
+                free = options['processes'] - len(running)
+                if free:
+                    for task_id in tasks.claim(free):
+                        self.running.add(task_id)
+                        running[pool.submit(tasks.run_in_worker, task_id)] = task_id
+                if not running:
+                    if options['once']:
+                        return done
+                    close_old_connections()
+                    time.sleep(options['poll'])
+                    continue
+                finished, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task_id = running.pop(future)
+                    self.running.discard(task_id)
+                    try:
+                        self.report(task_id, future.result())
+                    except Exception as exc:  # noqa: BLE001 - e.g. a worker process died
+                        requeued = tasks.requeue(Task.objects.filter(id=task_id, status='running'))
+                        outcome = "requeued" if requeued else f"failed after {tasks.MAX_ATTEMPTS} attempts"
+                        self.stderr.write(f"Task #{task_id}: worker error {exc!r}; {outcome}.")
+                    done += 1
+        except KeyboardInterrupt:
+            self.stdout.write(f"Stopping; waiting for {len(running)} running tasks.")
+            return done
@@ -0,0 +1,66 @@
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.benchmarking import percentile
+from myapp.instrumentation import get_config
+
+
+class Command(BaseCommand):
+    help = "Aggregates the slow-request log into a per-view report, hottest (most total time) first."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help="Log file (default: REQUEST_INSTRUMENTATION['LOG_FILE']). "
+                                          "Rotated backups (.1, .2, ...) are read too.")
+        parser.add_argument('--top', type=int, default=10, help="Number of views to show.")
+        parser.add_argument('--queries', type=int, default=3, help="Repeated query fingerprints to show per view.")
+
+    def log_files(self, path):
+        """The log and its rotated backups, oldest first."""
+        backups = [p for p in path.parent.glob(path.name + '.*') if p.suffix[1:].isdigit()]
+        backups.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+        return backups + ([path] if path.exists() else [])
+
+    def handle(self, *args, **options):
+        path = Path(options['log'] or get_config()['LOG_FILE'] or '')
+        files = self.log_files(path) if path.name else []
+        if not files:
+            raise CommandError(f"No slow-request log found at {path}.")
+
+        by_view = defaultdict(list)
+        skipped = 0
+        for log_file in files:
+            with open(log_file) as lines:
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    by_view[record.get('view') or record.get('path')].append(record)
+
+        hot = sorted(by_view.items(), key=lambda entry: -sum(r['wall_ms'] for r in entry[1]))
+        self.stdout.write(
+            f"{'view':<32}{'reqs':>6}{'total s':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'sql/req':>9}{'sql %':>7}"
+        )
+        for view, records in hot[:options['top']]:
+            walls = sorted(r['wall_ms'] for r in records)
+            sampled = [r for r in records if r.get('sampled')]
+            sql_count = sum(r['sql_count'] for r in sampled) / len(sampled) if sampled else 0
+            sampled_wall = sum(r['wall_ms'] for r in sampled)
+            sql_share = 100 * sum(r['sql_ms'] for r in sampled) / sampled_wall if sampled_wall else 0
+            self.stdout.write(
+                f"{str(view)[:31]:<32}{len(records):>6}{sum(walls) / 1000:>9.1f}{percentile(walls, 50):>9.1f}"
+                f"{percentile(walls, 95):>9.1f}{walls[-1]:>9.1f}{sql_count:>9.1f}{sql_share:>6.0f}%"
+            )
+            repeats = Counter()
+            for record in sampled:
+                for query in record.get('repeated', []):
+                    repeats[query['sql']] += query['count']
+            for sql, count in repeats.most_common(options['queries']):
+                self.stdout.write(f"    {count / len(sampled):>6.1f}x/req  {sql[:110]}")
+
+        if skipped:
+            self.stderr.write(f"Skipped {skipped} unreadable lines.")
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = ("Sets the SQLite database file's journal mode (default: the DB_PROFILE's, WAL for the tuned "
+            "profile). It is stored in the file, so this is run once after creating the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('mode', nargs='?', choices=['wal', 'delete', 'truncate', 'persist'],
+                            help="Default: settings.SQLITE_JOURNAL_MODE.")
+        parser.add_argument('--show', action='store_true', help="Only print the current journal mode.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"The database is {connection.vendor}, not SQLite.")
+        with connection.cursor() as cursor:
+            if not options['show']:
+                mode = options['mode'] or settings.SQLITE_JOURNAL_MODE
+                if not mode:
+                    raise CommandError("No journal mode given and none set for this DB_PROFILE.")
+                cursor.execute(f'PRAGMA journal_mode = {mode}')
+            cursor.execute('PRAGMA journal_mode')
+            current = cursor.fetchone()[0]
+        self.stdout.write(f"{connection.settings_dict['NAME']}: journal_mode={current}")
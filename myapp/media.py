@@ -0,0 +1,127 @@
+# mysite/myapp/media.py
+
+"""Serves uploaded media (MEDIA_URL) from MEDIA_ROOT.
+
+This replaces the development-only ``static()`` route. Files stream through
+FileResponse, which lets the WSGI server use sendfile. Responses carry an
+ETag and Last-Modified and answer conditional GETs with 304. A single byte
+``Range`` gets a 206 partial response, and ``If-Range`` is honoured.
+
+Content-addressed images (see mysite/images.py) never change, so browsers may keep
+them for a year without revalidating. Missing avatar and menu card variants
+of a stored image are generated on their first request and kept on disk.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from mysite.images import create_lazy_variant, is_content_addressed
+
+# Browser cache lifetime of media that may be replaced under the same name (e.g. the default avatar)
+MEDIA_MAX_AGE = 60 * 60
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+RANGE_CHUNK_SIZE = 64 * 1024
+
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _media_path(path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        return safe_join(settings.MEDIA_ROOT, path), path
+    except SuspiciousFileOperation:
+        raise Http404("Not found.")
+
+
+def _byte_range(header, size):
+    """(start, end) of a single-range `Range` header, inclusive; None to send the whole file.
+
+    Raises ValueError if the range can't be satisfied.
+    """
+    match = _BYTE_RANGE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        # Malformed or multi-range requests may be answered with the whole file
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Weak validators can't be used for ranges, and ours are strong
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as media_file:
+        media_file.seek(start)
+        while length > 0:
+            chunk = media_file.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    """Serves a file under MEDIA_ROOT, generating a missing image variant on its first request."""
+    full_path, path = _media_path(path)
+    if not os.path.isfile(full_path) and not create_lazy_variant(path):
+        raise Http404("Not found.")
+    stat = os.stat(full_path)
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        byte_range = None
+        if request.headers.get('Range') and _if_range_matches(request, etag, last_modified):
+            try:
+                byte_range = _byte_range(request.headers['Range'], stat.st_size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(full_path, start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if is_content_addressed(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=MEDIA_MAX_AGE)
+    return response
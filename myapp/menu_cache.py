@@ -0,0 +1,91 @@
+# mysite/myapp/menu_cache.py
+
+"""Versioned per-restaurant cache for the public menu.
+
+Every restaurant (keyed by the owner's username) has a version stamp in the
+'shared' cache, which every process reads, so an import_items run or a task
+worker invalidates the menu a running server shows. Cached item rows are stored under a key that includes that version, so
+bumping the version on any Item write invalidates the old rows without having
+to track or delete them. The version stamp doubles as the ETag/Last-Modified
+value for the public menu page.
+"""
+
+import time
+
+from django.core.cache import cache, caches
+
+# The root menu ('' route) lists every restaurant, so it has its own version.
+ALL_RESTAURANTS = '*'
+
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(username):
+    return f'menu:version:{username or ALL_RESTAURANTS}'
+
+
+def get_menu_version(username=None):
+    """Returns the current version stamp (a float timestamp) for a restaurant's menu."""
+    key = _version_key(username)
+    versions = caches['shared']
+    version = versions.get(key)
+    if version is None:
+        version = time.time()
+        # add() so two concurrent first requests agree on the same stamp
+        if not versions.add(key, version, MENU_CACHE_TIMEOUT):
+            version = versions.get(key, version)
+    return version
+
+
+async def aget_menu_version(username=None):
+    """Async version of get_menu_version()."""
+    key = _version_key(username)
+    versions = caches['shared']
+    version = await versions.aget(key)
+    if version is None:
+        version = time.time()
+        if not await versions.aadd(key, version, MENU_CACHE_TIMEOUT):
+            version = await versions.aget(key, version)
+    return version
+
+
+def bump_menu_version(username=None):
+    """Invalidates the cached menu for a restaurant and for the root menu."""
+    now = time.time()
+    versions = caches['shared']
+    if username:
+        versions.set(_version_key(username), now, MENU_CACHE_TIMEOUT)
+    versions.set(_version_key(ALL_RESTAURANTS), now, MENU_CACHE_TIMEOUT)
+
+
+def menu_items_key(username, version):
+    return f'menu:items:{username or ALL_RESTAURANTS}:{version}'
+
+
+def menu_queryset(username=None):
+    """Available items for one restaurant (or every restaurant), in id order."""
+    from .models import Item
+
+    item_list = Item.objects.filter(is_available=True)
+    if username:
+        item_list = item_list.filter(user_name__username=username)
+    return item_list.order_by('id')
+
+
+def get_menu_items(username, version):
+    """Returns the cached item rows for this menu version, querying the database on a miss."""
+    return cache.get_or_set(
+        menu_items_key(username, version),
+        lambda: list(menu_queryset(username)),
+        MENU_CACHE_TIMEOUT,
+    )
+
+
+async def aget_menu_items(username, version):
+    """Async version of get_menu_items()."""
+    key = menu_items_key(username, version)
+    items = await cache.aget(key)
+    if items is None:
+        items = [item async for item in menu_queryset(username)]
+        await cache.aset(key, items, MENU_CACHE_TIMEOUT)
+    return items
@@ -0,0 +1,185 @@
+# mysite/myapp/menu_io.py
+
+"""Bulk menu import and export for one restaurant.
+
+Imports read a CSV (with a header row) or JSON Lines stream one row at a time,
+validate each row with the same rules as the item form (``ItemImportForm``),
+and upsert valid rows in batches on the restaurant's (owner, item name) unique
+constraint. One INSERT ... ON CONFLICT DO UPDATE covers a whole batch. Rows
+with errors are skipped and reported with their line number. Exports stream
+rows straight from a database cursor, so neither direction holds the whole
+menu in memory.
+"""
+
+import csv
+import io
+import json
+
+from .forms import ItemImportForm
+from mysite.images import decode_data_uri, open_image, store_image
+from .menu_cache import bump_menu_version
+from .models import Item
+from . import search
+
+FIELDS = ['item_name', 'item_description', 'item_price', 'item_image', 'is_available']
+UPSERT_FIELDS = ['item_description', 'item_price', 'item_image', 'is_available', 'updated_at']
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+BATCH_SIZE = 500
+# Errors kept for the report; the count of failed rows is always exact
+MAX_REPORTED_ERRORS = 100
+# Accepted is_available spellings (lower-cased); an empty cell means available, like the form's default
+AVAILABLE_VALUES = {
+    '': True, 'true': True, 't': True, 'yes': True, 'y': True, '1': True, 'on': True,
+    'false': False, 'f': False, 'no': False, 'n': False, '0': False, 'off': False,
+}
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def iter_rows(text_stream, fmt):
+    """Yields (line_number, row_dict) from a text stream, without reading it all at once."""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def _parse_available(value):
+    """is_available from a CSV cell or JSON value; None if it is not a recognised spelling."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        return AVAILABLE_VALUES.get(value.strip().lower())
+    return None
+
+
+def _clean_row(row, dry_run=False):
+    """Validates one row with the item form rules. Returns (Item, None) or (None, errors).
+
+    An embedded photo (data URI) is only written to the media store once the
+    rest of the row is valid, and never on a dry run.
+    """
+    if row is None:
+        return None, {'__all__': ["Not a JSON object."]}
+    data = {field: row.get(field) for field in FIELDS}
+    for field in FIELDS:
+        if data[field] is None:
+            data[field] = ''
+    is_available = _parse_available(data['is_available'])
+    if is_available is None:
+        return None, {'is_available': ["Use true/false, yes/no or 1/0."]}
+    data['is_available'] = is_available
+    image_data = decode_data_uri(data['item_image']) if isinstance(data['item_image'], str) else None
+    if image_data is not None:
+        # Too long for the column as it is; the stored file's short path replaces it below
+        data['item_image'] = ''
+    form = ItemImportForm(data)
+    if not form.is_valid():
+        return None, {field: list(messages) for field, messages in form.errors.items()}
+    item = form.save(commit=False)
+    if image_data is not None:
+        try:
+            open_image(image_data)
+        except ValueError as error:
+            return None, {'item_image': [str(error)]}
+        if not dry_run:
+            item.item_image = store_image(image_data)
+            if item.item_image is None:
+                # The header was fine but the pixel data isn't
+                return None, {'item_image': ["Not a readable image."]}
+    return item, None
+
+
+def _upsert(owner, items_by_name):
+    items = list(items_by_name.values())
+    for item in items:
+        item.user_name = owner
+    # A row without an image keeps the existing item's image (e.g. re-importing an export
+    # without the image column), so those rows are upserted without item_image
+    with_image = [item for item in items if item.item_image]
+    without_image = [item for item in items if not item.item_image]
+    for batch, update_fields in (
+        (with_image, UPSERT_FIELDS),
+        (without_image, [field for field in UPSERT_FIELDS if field != 'item_image']),
+    ):
+        if batch:
+            Item.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=['user_name', 'item_name'], update_fields=update_fields,
+            )
+    # Upserted rows don't fire post_save, so refresh their search entries here
+    search.index_items(Item.objects.filter(user_name=owner, item_name__in=items_by_name).only(
+        'id', 'item_name', 'item_description'
+    ))
+    return len(items)
+
+
+def import_items(owner, rows, batch_size=BATCH_SIZE, dry_run=False):
+    """Upserts validated rows into the owner's menu.
+
+    Returns {'imported': n, 'failed': n, 'errors': [(line_number, {field: [messages]}), ...]}.
+    A name repeated in the file keeps its last row.
+    """
+    result = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = {}
+    for line_number, row in rows:
+        item, errors = _clean_row(row, dry_run)
+        if errors:
+            result['failed'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append((line_number, errors))
+            continue
+        # Re-inserting the name moves it to the end, so the batch keeps file order
+        batch.pop(item.item_name, None)
+        batch[item.item_name] = item
+        if len(batch) >= batch_size:
+            result['imported'] += len(batch) if dry_run else _upsert(owner, batch)
+            batch = {}
+    if batch:
+        result['imported'] += len(batch) if dry_run else _upsert(owner, batch)
+    # bulk_create skips the post_save signal that normally invalidates the cached menu
+    if result['imported'] and not dry_run:
+        bump_menu_version(owner.username)
+    return result
+
+
+def import_file(owner, binary_file, fmt, **kwargs):
+    """import_items() for an uploaded or opened binary file (UTF-8, BOM allowed)."""
+    text_stream = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        return import_items(owner, iter_rows(text_stream, fmt), **kwargs)
+    finally:
+        # Don't close the underlying file along with the wrapper
+        text_stream.detach()
+
+
+class Echo:
+    """A file-like object whose write() returns the line, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(owner, fmt, chunk_size=BATCH_SIZE):
+    """Yields the owner's menu as CSV or JSON Lines text, one row at a time."""
+    rows = Item.objects.filter(user_name=owner).order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(FIELDS, row))) + '\n'
+        return
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
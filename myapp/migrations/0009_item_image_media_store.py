@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+import hashlib
+
+from django.db import migrations, models
+
+from mysite.images import store_data_uri
+
+
+def move_data_uris_to_media(apps, schema_editor):
+    """Moves inline base64 item images into the content-addressed media store."""
+    Item = apps.get_model('myapp', 'Item')
+    # Most rows share the old default image, so decode/store each distinct data-URI once
+    stored = {}
+    batch = []
+    rows = Item.objects.filter(item_image__startswith='data:').only('id', 'item_image')
+    for item in rows.iterator(chunk_size=500):
+        key = hashlib.sha256(item.item_image.encode()).hexdigest()
+        if key not in stored:
+            stored[key] = store_data_uri(item.item_image)
+        if stored[key]:
+            item.item_image = stored[key]
+            batch.append(item)
+        if len(batch) >= 500:
+            Item.objects.bulk_update(batch, ['item_image'])
+            batch = []
+    if batch:
+        Item.objects.bulk_update(batch, ['item_image'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_item_is_available_alter_item_item_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_data_uris_to_media, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='item',
+            name='item_image',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+    ]
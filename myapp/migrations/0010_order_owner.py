@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_order_owner(apps, schema_editor):
+    """Sets Order.owner from the owner of the order's first still-existing item."""
+    Order = apps.get_model('myapp', 'Order')
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+    first_item_owner = OrderItem.objects.filter(
+        order=OuterRef('pk'), item__isnull=False
+    ).order_by('id').values('item__user_name')[:1]
+    Order.objects.filter(owner__isnull=True).update(owner=Subquery(first_item_owner))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_item_image_media_store'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restaurant_orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_order_owner, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['owner', 'status', 'created_at'], name='order_owner_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['owner', 'is_paid'], name='order_owner_paid'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_rollups(apps, schema_editor):
+    """Seeds the rollup from existing paid orders."""
+    ItemSalesDaily = apps.get_model('myapp', 'ItemSalesDaily')
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+    rows = OrderItem.objects.filter(order__is_paid=True, order__owner__isnull=False).annotate(
+        day=TruncDate('order__created_at')
+    ).values('order__owner', 'item_name', 'day').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('item_price') * F('quantity'), output_field=DecimalField()),
+    ).order_by()
+    ItemSalesDaily.objects.bulk_create(
+        ItemSalesDaily(
+            owner_id=row['order__owner'], item_name=row['item_name'], day=row['day'],
+            quantity=row['total_quantity'], revenue=row['total_revenue'],
+        )
+        for row in rows.iterator(chunk_size=1000)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_order_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_name', models.CharField(max_length=100)),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_sales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'item_name', 'day'), name='unique_item_sales_day')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
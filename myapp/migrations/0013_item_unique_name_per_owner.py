@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def rename_duplicate_items(apps, schema_editor):
+    """Keeps the oldest item of each (owner, name) pair as is and suffixes the others with their id."""
+    Item = apps.get_model('myapp', 'Item')
+    duplicates = Item.objects.values('user_name', 'item_name').annotate(
+        copies=Count('id'), first_id=Min('id')
+    ).filter(copies__gt=1).order_by()
+    renamed = []
+    for group in duplicates:
+        for item in Item.objects.filter(
+            user_name=group['user_name'], item_name=group['item_name']
+        ).exclude(id=group['first_id']):
+            suffix = f" ({item.id})"
+            item.item_name = item.item_name[:100 - len(suffix)] + suffix
+            renamed.append(item)
+    Item.objects.bulk_update(renamed, ['item_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_order_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(fields=('user_name', 'item_name'), name='unique_item_name_per_owner'),
+        ),
+    ]
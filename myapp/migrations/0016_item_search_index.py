@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+from django.db import migrations
+
+from myapp import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index(schema_editor, apps.get_model('myapp', 'Item'))
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor, apps.get_model('myapp', 'Item'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_item_updated_at'),
+    ]
+
+    operations = [
+        # SQLite FTS5 table or PostgreSQL GIN index, see myapp/search.py
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
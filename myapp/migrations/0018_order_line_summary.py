@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:50
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+ITEM_SUMMARY_LENGTH = 255
+
+
+def backfill_line_summary(apps, schema_editor):
+    """Sets line_count and item_summary of existing orders from their lines, a batch of orders at a time."""
+    Order = apps.get_model('myapp', 'Order')
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+    last_id = 0
+    while True:
+        orders = list(Order.objects.filter(id__gt=last_id).order_by('id').only('id')[:BATCH_SIZE])
+        if not orders:
+            return
+        last_id = orders[-1].id
+        lines = OrderItem.objects.filter(order_id__in=[order.id for order in orders]).order_by(
+            'order_id', 'id'
+        ).values_list('order_id', 'item_name', 'quantity')
+        by_order = {
+            order_id: [(item_name, quantity) for _, item_name, quantity in group]
+            for order_id, group in groupby(lines, key=lambda line: line[0])
+        }
+        for order in orders:
+            order_lines = by_order.get(order.id, [])
+            summary = ', '.join(f"{quantity}x {item_name}" for item_name, quantity in order_lines)
+            if len(summary) > ITEM_SUMMARY_LENGTH:
+                summary = summary[:ITEM_SUMMARY_LENGTH - 1] + '…'
+            order.line_count = len(order_lines)
+            order.item_summary = summary
+        Order.objects.bulk_update(orders, ['line_count', 'item_summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_summary',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_line_summary, migrations.RunPython.noop),
+    ]
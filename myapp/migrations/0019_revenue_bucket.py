@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:53
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+
+def build_buckets(apps, schema_editor):
+    """Seeds the hourly and daily buckets from existing paid orders, live and archived."""
+    RevenueBucket = apps.get_model('myapp', 'RevenueBucket')
+    for period, trunc in (('hour', TruncHour), ('day', TruncDay)):
+        totals = defaultdict(lambda: [0, 0])
+        for model_name in ('Order', 'ArchivedOrder'):
+            rows = apps.get_model('myapp', model_name).objects.filter(is_paid=True, owner__isnull=False).annotate(
+                start=trunc('created_at')
+            ).values('owner', 'start').annotate(orders=Count('id'), revenue=Sum('total_price')).order_by()
+            for row in rows.iterator(chunk_size=1000):
+                totals[row['owner'], row['start']][0] += row['orders']
+                totals[row['owner'], row['start']][1] += row['revenue']
+        RevenueBucket.objects.bulk_create((
+            RevenueBucket(owner_id=owner_id, period=period, start=start, orders=orders, revenue=revenue)
+            for (owner_id, start), (orders, revenue) in totals.items()
+        ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_order_line_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_buckets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'period', 'start'), name='unique_revenue_bucket')],
+            },
+        ),
+        migrations.RunPython(build_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+# mysite/myapp/order_history.py
+
+"""Order history export and archival.
+
+Finished orders (Completed or Cancelled) older than a cutoff are moved, in
+batches, from Order/OrderItem into the compact ArchivedOrder/ArchivedOrderItem
+tables. That keeps the live tables, and every query on them, sized to recent
+business. The sales rollup is left untouched: archived paid orders still count
+as sales, and ``rollups.raw_item_sales`` reads both tables when rebuilding or
+verifying it.
+
+The per-restaurant export streams live and archived lines from database
+cursors (``iterator(chunk_size=...)``), so memory stays constant however long
+the history is.
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .menu_io import Echo
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+FINISHED_STATUSES = ['Completed', 'Cancelled']
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+EXPORT_COLUMNS = [
+    'order_id', 'created_at', 'table_number', 'status', 'is_paid', 'order_total',
+    'item_name', 'item_price', 'quantity', 'line_total',
+]
+CHUNK_SIZE = 2000
+
+
+def day_range(start=None, end=None):
+    """Converts inclusive local dates to a created_at filter (>= start midnight, < midnight after end)."""
+    filters = {}
+    if start:
+        filters['order__created_at__gte'] = timezone.make_aware(datetime.combine(start, time.min))
+    if end:
+        filters['order__created_at__lt'] = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return filters
+
+
+def _lines(model, owner, start, end, chunk_size):
+    return model.objects.filter(order__owner=owner, **day_range(start, end)).order_by(
+        'order__created_at', 'order_id', 'id'
+    ).values_list(
+        'order_id', 'order__created_at', 'order__table_number', 'order__status', 'order__is_paid',
+        'order__total_price', 'item_name', 'item_price', 'quantity',
+    ).iterator(chunk_size=chunk_size)
+
+
+def export_lines(owner, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Yields one tuple per order line (EXPORT_COLUMNS), archived orders first, then live ones."""
+    for model in (ArchivedOrderItem, OrderItem):
+        for *order_columns, item_name, item_price, quantity in _lines(model, owner, start, end, chunk_size):
+            order_columns[1] = timezone.localtime(order_columns[1]).isoformat()
+            yield (*order_columns, item_name, item_price, quantity, item_price * quantity)
+
+
+def export_rows(owner, fmt, start=None, end=None):
+    """Yields the restaurant's order history as CSV or JSON Lines text."""
+    lines = export_lines(owner, start, end)
+    if fmt == 'jsonl':
+        for line in lines:
+            yield json.dumps(dict(zip(EXPORT_COLUMNS, line)), default=str) + '\n'
+        return
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for line in lines:
+        yield writer.writerow(line)
+
+
+def archivable_orders(cutoff, owner_ids=None):
+    orders = Order.objects.filter(status__in=FINISHED_STATUSES, created_at__lt=cutoff)
+    if owner_ids is not None:
+        orders = orders.filter(owner__in=owner_ids)
+    return orders
+
+
+def archive_batch(order_ids):
+    """Moves the given orders and their lines into the archive tables in one transaction."""
+    with transaction.atomic():
+        # Re-checked inside the transaction: an order may have been reopened since it was picked
+        orders = list(Order.objects.filter(id__in=order_ids, status__in=FINISHED_STATUSES).values_list(
+            'id', 'owner_id', 'table_number', 'status', 'total_price', 'created_at', 'is_paid',
+        ))
+        order_ids = [order[0] for order in orders]
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(id=order_id, owner_id=owner_id, table_number=table_number, status=status,
+                          total_price=total_price, created_at=created_at, is_paid=is_paid)
+            for order_id, owner_id, table_number, status, total_price, created_at, is_paid in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(order_id=order_id, item_name=item_name, item_price=item_price, quantity=quantity)
+            for order_id, item_name, item_price, quantity in OrderItem.objects.filter(
+                order_id__in=order_ids
+            ).values_list('order_id', 'item_name', 'item_price', 'quantity')
+        ])
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+    return len(orders)
+
+
+def archive_orders(cutoff, owner_ids=None, batch_size=1000):
+    """Archives every finished order created before `cutoff`, `batch_size` orders per transaction.
+
+    Short transactions keep checkout and the kitchen screen responsive while a
+    large backlog is archived. Returns the number of orders moved.
+    """
+    moved = 0
+    while True:
+        order_ids = list(archivable_orders(cutoff, owner_ids).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not order_ids:
+            return moved
+        moved += archive_batch(order_ids)
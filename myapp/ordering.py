@@ -0,0 +1,179 @@
+# mysite/myapp/ordering.py
+
+"""Order placement shared by the HTML checkout and the JSON API, and order status transitions."""
+
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import analytics, rollups
+from .cart import cart_items
+from .events import publish_order_event
+from .models import ACTIVE_STATUSES, Order, OrderItem
+
+
+class ItemsUnavailable(Exception):
+    """Raised when a cart references deleted or unavailable items. Nothing is written."""
+
+    def __init__(self, item_ids, names):
+        super().__init__(f"Unavailable items: {', '.join(names) or item_ids}")
+        self.item_ids = item_ids
+        self.names = names
+
+
+class InvalidTransition(Exception):
+    """Raised for a status change the Order workflow doesn't allow."""
+
+    def __init__(self, from_status, to_status):
+        super().__init__(f"An order can't go from {from_status} to {to_status}.")
+        self.from_status = from_status
+        self.to_status = to_status
+
+
+def _create_orders(request, cart, items):
+    """Writes the orders and their lines for a validated cart. Must run inside a transaction.
+
+    Each order carries its restaurant owner so the dashboard can scope by a single
+    indexed column, and its line count and item summary so the dashboard can list
+    it without its lines. A cart mixing restaurants (root menu) is split into one
+    order per restaurant so every kitchen sees only its own lines.
+    """
+    lines_by_owner = {}
+    for item_id_str, quantity in cart.items():
+        item = items[int(item_id_str)]
+        lines_by_owner.setdefault(item.user_name_id, []).append((item, quantity))
+
+    new_orders = [
+        Order(
+            user=request.user if request.user.is_authenticated else None,
+            owner_id=owner_id,
+            table_number=request.session.get('table_number'),
+            total_price=sum(Decimal(item.item_price) * quantity for item, quantity in lines),
+            line_count=len(lines),
+            item_summary=Order.summarize_lines((item.item_name, quantity) for item, quantity in lines),
+            status='Pending',
+            is_paid=False
+        )
+        for owner_id, lines in lines_by_owner.items()
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(new_orders)
+    else:
+        # Backends that can't return primary keys from a bulk insert (e.g. MySQL)
+        for new_order in new_orders:
+            new_order.save()
+
+    order_items = [
+        OrderItem(
+            order=new_order,
+            item=item,
+            item_name=item.item_name,
+            item_price=Decimal(item.item_price),
+            quantity=quantity
+        )
+        for new_order, lines in zip(new_orders, lines_by_owner.values())
+        for item, quantity in lines
+    ]
+    OrderItem.objects.bulk_create(order_items)
+    return new_orders, order_items
+
+
+def place_order(request, cart):
+    """Turns a non-empty cart into orders. Returns (orders, order_items).
+
+    Runs in one transaction with a single batched Item lookup. Prices are taken
+    from the current Item rows as Decimal rather than trusting client-side copies.
+    Raises ItemsUnavailable if any item was deleted or marked unavailable.
+    """
+    with transaction.atomic():
+        items = cart_items(cart, fields=('id', 'user_name_id', 'item_name', 'item_price', 'is_available'))
+        unavailable = [
+            item_id_str for item_id_str in cart
+            if int(item_id_str) not in items or not items[int(item_id_str)].is_available
+        ]
+        if unavailable:
+            names = [items[int(item_id_str)].item_name for item_id_str in unavailable if int(item_id_str) in items]
+            raise ItemsUnavailable(unavailable, names)
+        new_orders, order_items = _create_orders(request, cart, items)
+
+        # Announce the new orders on each restaurant's live kitchen feed (after commit)
+        for new_order in new_orders:
+            publish_order_event(new_order, 'order_created', lines=[line for line in order_items if line.order is new_order])
+    return new_orders, order_items
+
+
+def revenue_sign(from_status, to_status):
+    """+1 if the transition makes an order paid, -1 if it refunds a paid one, else 0."""
+    if to_status == 'Completed':
+        return 1
+    if from_status == 'Completed':
+        return -1
+    return 0
+
+
+def _transition(owner, order_ids, from_statuses, to_status):
+    """Moves the owner's orders in `order_ids` that are still in one of `from_statuses` to `to_status`.
+
+    The change is one conditional UPDATE (... WHERE owner = %s AND id IN (...)
+    AND status IN (...)), so an order another member of staff has already
+    moved is skipped instead of being overwritten, and there is no
+    read-modify-write window. The changed rows are then read back by the
+    timestamp the UPDATE wrote; they stay locked until commit, so nothing else
+    can have touched them. Their rollup lines, revenue buckets and live feed events are applied
+    in the same transaction. Every source status must have the same
+    revenue_sign() towards `to_status`. Each returned order has a
+    `revenue_delta` attribute.
+    """
+    sign = revenue_sign(from_statuses[0], to_status)
+    stamp = timezone.now()
+    with transaction.atomic():
+        updated = Order.objects.filter(owner=owner, id__in=order_ids, status__in=from_statuses).update(
+            # Only Completed orders are paid: Pending and Preparing ones never are
+            status=to_status, is_paid=to_status == 'Completed', updated_at=stamp,
+        )
+        if not updated:
+            return []
+        orders = list(Order.objects.filter(owner=owner, id__in=order_ids, status=to_status, updated_at=stamp))
+        if sign:
+            rollups.apply_orders(orders, sign)
+            analytics.apply_orders(orders, sign)
+        # Push the change to open kitchen dashboards
+        for order in orders:
+            order.revenue_delta = sign * order.total_price
+            publish_order_event(order, 'order_status', revenue_delta=str(order.revenue_delta))
+    return orders
+
+
+def transition_orders(owner, order_ids, from_status, to_status):
+    """Moves the owner's orders that are still `from_status` to `to_status`. Returns the changed orders.
+
+    Raises InvalidTransition for a change the workflow doesn't allow.
+    """
+    if not Order.can_transition(from_status, to_status):
+        raise InvalidTransition(from_status, to_status)
+    return _transition(owner, order_ids, [from_status], to_status)
+
+
+def bulk_transition(owner, to_status, order_ids=None, table_number=None):
+    """Moves the owner's active orders that can go to `to_status` there, in one UPDATE.
+
+    Limited to `order_ids` and/or one table when given, otherwise every active
+    order. Orders that can't make the change (e.g. Pending ones when
+    completing) are left alone. Returns the changed orders.
+    """
+    from_statuses = [status for status in ACTIVE_STATUSES if Order.can_transition(status, to_status)]
+    if not from_statuses:
+        raise InvalidTransition(' or '.join(ACTIVE_STATUSES), to_status)
+    if order_ids is None or table_number is not None:
+        # Resolved from the small active-orders index, so the UPDATE and the
+        # read-back are primary key lookups however long the order history is
+        candidates = Order.objects.filter(owner=owner, status__in=from_statuses)
+        if order_ids is not None:
+            candidates = candidates.filter(id__in=order_ids)
+        if table_number is not None:
+            candidates = candidates.filter(table_number=table_number)
+        order_ids = list(candidates.values_list('id', flat=True))
+    if not order_ids:
+        return []
+    return _transition(owner, order_ids, from_statuses, to_status)
@@ -0,0 +1,175 @@
+# mysite/myapp/qr.py
+
+"""Table QR code rendering with caching and bulk sheet export.
+
+A table's QR code only depends on the encoded menu URL and the render
+parameters, so rendered bytes are cached under a hash of both and never need
+invalidating. The export_table_qr command renders cache misses in parallel
+with a process pool; web requests and tasks render in their own process.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.core.cache import cache
+from django.urls import reverse
+from PIL import Image, ImageDraw, ImageFont
+
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+BOX_SIZE = 10
+BORDER = 4
+
+# A code renders in a few milliseconds while starting a worker takes ~0.3s, so
+# small batches are rendered inline
+PARALLEL_THRESHOLD = 50
+
+# What the menu URL's table segment accepts (a str converter), within Order.table_number's length
+TABLE_ID = re.compile(r'^[^/]{1,10}$')
+
+
+def render_qr(url, fmt='png', box_size=BOX_SIZE, border=BORDER):
+    """Renders a QR code for `url` and returns the image bytes. Runs in worker processes."""
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=box_size, border=border)
+    qr.add_data(url)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    if fmt == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _render_args(args):
+    return render_qr(*args)
+
+
+def qr_cache_key(url, fmt='png', box_size=BOX_SIZE, border=BORDER):
+    digest = hashlib.sha256(f'{fmt}|{box_size}|{border}|{url}'.encode()).hexdigest()
+    return f'qr:{digest}'
+
+
+def get_qr(url, fmt='png', box_size=BOX_SIZE, border=BORDER):
+    """Returns (bytes, etag) for a QR code, rendering it only on a cache miss."""
+    key = qr_cache_key(url, fmt, box_size, border)
+    data = cache.get(key)
+    if data is None:
+        data = render_qr(url, fmt, box_size, border)
+        cache.set(key, data, None)
+    return data, key.split(':', 1)[1]
+
+
+def get_many_qr(urls, fmt='png', workers=1):
+    """Returns the QR bytes for each url, in order.
+
+    With `workers` > 1 (None: one per CPU), large batches of cache misses are
+    rendered in a process pool. Web requests keep the default of 1 and render
+    in-process; the pool is for the export_table_qr command.
+    """
+    keys = [qr_cache_key(url, fmt) for url in urls]
+    cached = cache.get_many(keys)
+    missing = [(key, url) for key, url in zip(keys, urls) if key not in cached]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(missing) >= PARALLEL_THRESHOLD:
+        # spawn, not fork: forking a threaded web worker can deadlock the child
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            chunksize = max(1, len(missing) // (workers * 4))
+            rendered = list(pool.map(_render_args, [(url, fmt) for _, url in missing], chunksize=chunksize))
+    else:
+        rendered = [render_qr(url, fmt) for _, url in missing]
+
+    fresh = {key: data for (key, _), data in zip(missing, rendered)}
+    if fresh:
+        cache.set_many(fresh, None)
+    cached.update(fresh)
+    return [cached[key] for key in keys]
+
+
+def _label_font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+def build_pdf(tables):
+    """Builds a printable PDF with one A4 page (150 dpi) per (table_id, png_bytes) pair."""
+    page_size = (1240, 1754)
+    font = _label_font(64)
+    pages = []
+    for table_id, png in tables:
+        page = Image.new('RGB', page_size, 'white')
+        code = Image.open(BytesIO(png)).convert('RGB').resize((900, 900), Image.NEAREST)
+        page.paste(code, ((page_size[0] - 900) // 2, 380))
+        draw = ImageDraw.Draw(page)
+        for text, y in ((f'Table {table_id}', 160), ('Scan to Order', 1380)):
+            width = draw.textlength(text, font=font)
+            draw.text(((page_size[0] - width) / 2, y), text, fill='black', font=font)
+        pages.append(page)
+    buffer = BytesIO()
+    if pages:
+        pages[0].save(buffer, format='PDF', save_all=True, append_images=pages[1:], resolution=150)
+    return buffer.getvalue()
+
+
+def build_zip(tables, fmt='png'):
+    """Builds a ZIP with one table-<id>.<fmt> file per (table_id, bytes) pair."""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for table_id, data in tables:
+            archive.writestr(f'table-{table_id}.{fmt}', data)
+    return buffer.getvalue()
+
+
+MAX_SHEET_TABLES = 200
+
+
+def parse_tables(spec):
+    """Parses a table list like "1-20,25,VIP" into table ids, in order. Raises ValueError."""
+    tables = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, dash, end = part.partition('-')
+        if dash and start.isdigit() and end.isdigit():
+            if int(end) < int(start):
+                raise ValueError(f"Bad table range {part!r}.")
+            # Checked before expanding, so a huge range is never built
+            if len(tables) + int(end) - int(start) + 1 > MAX_SHEET_TABLES:
+                raise ValueError(f"At most {MAX_SHEET_TABLES} tables per sheet.")
+            tables.extend(str(n) for n in range(int(start), int(end) + 1))
+        else:
+            tables.append(part)
+        if len(tables) > MAX_SHEET_TABLES:
+            raise ValueError(f"At most {MAX_SHEET_TABLES} tables per sheet.")
+    for table_id in tables:
+        if not TABLE_ID.match(table_id):
+            raise ValueError(f"Bad table id {table_id!r}: at most 10 characters, no '/'.")
+    if not tables:
+        raise ValueError("No tables given.")
+    return list(dict.fromkeys(tables))
+
+
+def build_sheet(base_url, username, tables, export='pdf', fmt='png', workers=1):
+    """Renders the QR codes for `tables` of a restaurant and returns the PDF or ZIP bytes.
+
+    `base_url` is the scheme and host the codes point at, e.g. "https://food.example.com".
+    """
+    urls = [
+        base_url.rstrip('/') + reverse('myapp:menu_with_table', kwargs={'username': username, 'table_id': table_id})
+        for table_id in tables
+    ]
+    if export == 'pdf':
+        return build_pdf(zip(tables, get_many_qr(urls, 'png', workers)))
+    return build_zip(zip(tables, get_many_qr(urls, fmt, workers)), fmt)
@@ -0,0 +1,144 @@
+# mysite/myapp/rollups.py
+
+"""Incremental maintenance of the ItemSalesDaily sales rollup.
+
+An order contributes to the rollup while it is paid. Callers apply a +1 delta
+when an order becomes paid and a -1 delta when a paid order is refunded, inside
+the same transaction as the status change, so the rollup always matches
+the lines of paid orders, live or archived.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, DecimalField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedOrderItem, ItemSalesDaily, OrderItem
+
+
+def _order_deltas(orders, sign):
+    """Returns {(owner_id, day, item_name): [quantity, revenue]} for the orders' lines, multiplied by sign."""
+    days = {order.id: (order.owner_id, timezone.localdate(order.created_at)) for order in orders}
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    lines = OrderItem.objects.filter(order_id__in=list(days)).values_list('order_id', 'item_name', 'item_price', 'quantity')
+    for order_id, item_name, item_price, quantity in lines:
+        owner_id, day = days[order_id]
+        deltas[owner_id, day, item_name][0] += sign * quantity
+        deltas[owner_id, day, item_name][1] += sign * Decimal(item_price) * quantity
+    return deltas
+
+
+def apply_orders(orders, sign=1):
+    """Adds (sign=1) or removes (sign=-1) paid orders' lines from the rollup.
+
+    Lines are read in one query and merged per (owner, day, item), so a batch of
+    orders costs one UPDATE per distinct item rather than one per order line.
+    """
+    orders = [order for order in orders if order.owner_id is not None]
+    if not orders:
+        return
+    with transaction.atomic():
+        for (owner_id, day, item_name), (quantity, revenue) in _order_deltas(orders, sign).items():
+            increment(
+                ItemSalesDaily, {'owner_id': owner_id, 'item_name': item_name, 'day': day},
+                quantity=quantity, revenue=revenue,
+            )
+
+
+def increment(model, lookup, **deltas):
+    """Adds `deltas` to the counters of the rollup row matching `lookup`, creating it if needed.
+
+    The row's unique constraint must cover `lookup`. Must run inside a transaction.
+    """
+    rows = model.objects.filter(**lookup)
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another request created the row first; fall back to incrementing it
+        rows.update(**changes)
+
+
+def apply_order(order, sign=1):
+    """Adds (sign=1) or removes (sign=-1) a paid order's lines from the rollup."""
+    apply_orders([order], sign)
+
+
+def raw_item_sales(owner_ids=None):
+    """Aggregates paid order lines per (owner, item_name, day) straight from the order tables.
+
+    Archived orders (order_history.py) are included, so archiving never changes the result.
+    """
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    for model in (OrderItem, ArchivedOrderItem):
+        lines = model.objects.filter(order__is_paid=True, order__owner__isnull=False)
+        if owner_ids is not None:
+            lines = lines.filter(order__owner__in=owner_ids)
+        rows = lines.annotate(day=TruncDate('order__created_at')).values(
+            'order__owner', 'item_name', 'day'
+        ).annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum(F('item_price') * F('quantity'), output_field=DecimalField()),
+        ).order_by()
+        # A day split by the archive cutoff has rows in both tables
+        for row in rows.iterator():
+            key = (row['order__owner'], row['item_name'], row['day'])
+            totals[key][0] += row['total_quantity']
+            totals[key][1] += Decimal(row['total_revenue'])
+    return [
+        {'order__owner': owner_id, 'item_name': item_name, 'day': day,
+         'total_quantity': quantity, 'total_revenue': revenue}
+        for (owner_id, item_name, day), (quantity, revenue) in totals.items()
+    ]
+
+
+def rebuild(owner_ids=None, batch_size=1000):
+    """Replaces the rollup rows (optionally only for some owners) with a fresh aggregate."""
+    with transaction.atomic():
+        existing = ItemSalesDaily.objects.all()
+        if owner_ids is not None:
+            existing = existing.filter(owner__in=owner_ids)
+        existing.delete()
+        batch = []
+        created = 0
+        for row in raw_item_sales(owner_ids):
+            batch.append(ItemSalesDaily(
+                owner_id=row['order__owner'], item_name=row['item_name'], day=row['day'],
+                quantity=row['total_quantity'], revenue=row['total_revenue'],
+            ))
+            if len(batch) >= batch_size:
+                created += len(ItemSalesDaily.objects.bulk_create(batch))
+                batch = []
+        created += len(ItemSalesDaily.objects.bulk_create(batch))
+    return created
+
+
+def verify(owner_ids=None):
+    """Compares the rollup with the raw aggregate per (owner, item_name, day). Returns a list of mismatches."""
+    def totals(rows, owner_key, quantity_key, revenue_key):
+        result = defaultdict(lambda: [0, Decimal('0')])
+        for row in rows:
+            key = (row[owner_key], row['item_name'], row['day'])
+            result[key][0] += row[quantity_key]
+            result[key][1] += Decimal(row[revenue_key])
+        return result
+
+    rolled = ItemSalesDaily.objects.all()
+    if owner_ids is not None:
+        rolled = rolled.filter(owner__in=owner_ids)
+    expected = totals(raw_item_sales(owner_ids), 'order__owner', 'total_quantity', 'total_revenue')
+    actual = totals(rolled.values('owner', 'item_name', 'day', 'quantity', 'revenue'), 'owner', 'quantity', 'revenue')
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        want = tuple(expected.get(key, (0, Decimal('0'))))
+        got = tuple(actual.get(key, (0, Decimal('0'))))
+        if want != got:
+            mismatches.append((key, want, got))
+    return mismatches
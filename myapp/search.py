@@ -0,0 +1,152 @@
+# mysite/myapp/search.py
+
+"""Full-text search, price filtering and keyset pagination for the public menu.
+
+Item names and descriptions are searched through a backend-specific index:
+
+* SQLite: an FTS5 virtual table (``myapp_item_search``) whose rowid is the
+  item id. It holds its own copy of the text and is kept in sync by the Item
+  post_save/post_delete signals (models.py) and by the bulk menu import,
+  which bypasses signals.
+* PostgreSQL: a GIN index on the items' ``tsvector`` expression. It is
+  maintained by the database, so nothing needs syncing.
+* Other backends fall back to ``icontains``.
+
+Every word of the query is matched as a prefix ("dos" finds "Dosa"). Pages
+are ordered by id and continue after the last id shown (a keyset cursor),
+so a deep page costs the same as the first one.
+"""
+
+import re
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .menu_cache import menu_queryset
+
+FTS_TABLE = 'myapp_item_search'
+PG_INDEX_NAME = 'item_search_vector'
+PAGE_SIZE = 48
+MAX_QUERY_WORDS = 8
+
+_WORD = re.compile(r'\w+')
+
+
+def _search_vector():
+    return SearchVector('item_name', 'item_description', config='english')
+
+
+def query_words(text):
+    return _WORD.findall(text or '')[:MAX_QUERY_WORDS]
+
+
+def create_index(schema_editor, item_model):
+    """Creates and fills the search index. Used by migrations."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "item_name, item_description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, item_name, item_description) "
+            f"SELECT id, item_name, item_description FROM {item_model._meta.db_table}"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.add_index(item_model, GinIndex(_search_vector(), name=PG_INDEX_NAME))
+
+
+def drop_index(schema_editor, item_model):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(item_model, GinIndex(_search_vector(), name=PG_INDEX_NAME))
+
+
+def index_items(items):
+    """Adds or refreshes items in the SQLite FTS table (no-op on other backends)."""
+    if connection.vendor != 'sqlite':
+        return
+    rows = [(item.id, item.item_name, item.item_description) for item in items]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, item_name, item_description) VALUES (%s, %s, %s)", rows
+        )
+
+
+def unindex_items(item_ids):
+    if connection.vendor != 'sqlite' or not item_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(item_id,) for item_id in item_ids])
+
+
+def rebuild_index(batch_size=2000):
+    """Refills the SQLite FTS table from the Item table. Returns the number of rows indexed."""
+    from .models import Item
+
+    if connection.vendor != 'sqlite':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, item_name, item_description) "
+            f"SELECT id, item_name, item_description FROM {Item._meta.db_table}"
+        )
+    return Item.objects.count()
+
+
+def search(queryset, text):
+    """Filters an Item queryset to rows matching every word of `text` (as prefixes)."""
+    words = query_words(text)
+    if not words:
+        return queryset
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        return queryset.alias(document=_search_vector()).filter(
+            document=SearchQuery(tsquery, config='english', search_type='raw')
+        )
+    for word in words:
+        queryset = queryset.filter(Q(item_name__icontains=word) | Q(item_description__icontains=word))
+    return queryset
+
+
+def _page_queryset(username, text, min_price, max_price, after):
+    items = search(menu_queryset(username), text)
+    if min_price is not None:
+        items = items.filter(item_price__gte=min_price)
+    if max_price is not None:
+        items = items.filter(item_price__lte=max_price)
+    if after:
+        items = items.filter(id__gt=after)
+    return items
+
+
+def _split_page(rows, limit):
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def menu_page(username=None, text='', min_price=None, max_price=None, after=None, limit=PAGE_SIZE):
+    """Returns (items, next_cursor) for one page of available items, in id order.
+
+    `after` is the previous page's next_cursor; next_cursor is None on the last page.
+    """
+    items = _page_queryset(username, text, min_price, max_price, after)
+    return _split_page(list(items[:limit + 1]), limit)
+
+
+async def amenu_page(username=None, text='', min_price=None, max_price=None, after=None, limit=PAGE_SIZE):
+    """Async version of menu_page()."""
+    items = _page_queryset(username, text, min_price, max_price, after)
+    return _split_page([item async for item in items[:limit + 1]], limit)
@@ -0,0 +1,218 @@
+# mysite/myapp/tasks.py
+
+"""Database-backed background task queue.
+
+Views hand slow work (exports, QR sheets, profile pictures) to ``enqueue()``,
+answer at once and let the browser poll the task's status. The Task table is
+the queue, so no broker is needed. The ``run_task_worker`` command claims
+queued tasks and runs them in a pool of spawned processes, so jobs spread
+over every core and never hold up a request worker.
+
+Jobs are functions registered with ``@task('name')`` in an app's ``tasks.py``.
+Those modules are imported by ``autodiscover()`` once the app registry is
+ready, in the web process and in every worker process alike. A job is called
+with the Task and its keyword arguments and returns a JSON-serialisable
+result. ``save_result_file()`` keeps a file result in private storage
+(``TASK_RESULTS_ROOT``, not MEDIA_ROOT, which is served publicly). Only the
+task's owner can download it, through the ``task_download`` view.
+
+A worker claims tasks with one conditional UPDATE
+(... WHERE id IN (...) AND status = 'queued') and reads back the rows
+carrying the timestamp it wrote, as ordering._transition does. Two workers
+never run the same task.
+
+A claimed task is leased: its worker renews ``heartbeat_at`` every
+HEARTBEAT_EVERY seconds while it runs. Every worker periodically requeues
+running tasks whose heartbeat is older than STALE_AFTER, which only happens
+when their worker is gone, however long a task legitimately runs.
+"""
+
+import logging
+import tempfile
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from users.uploads import apply_upload, profile_image_uploaded
+
+from . import menu_io, order_history, qr
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+FINISHED_STATUSES = ['done', 'failed']
+# Seconds between a worker's heartbeats for its running tasks, and without one
+# after which a running task is assumed to have lost its worker
+HEARTBEAT_EVERY = 10
+STALE_AFTER = 60
+MAX_ATTEMPTS = 3
+
+
+def task(name):
+    """Registers a job function under `name`."""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def autodiscover():
+    """Imports every installed app's tasks module, registering its jobs."""
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, /, owner=None, **kwargs):
+    """Queues job `name` with JSON-serialisable keyword arguments. Returns the Task."""
+    if name not in TASKS:
+        raise KeyError(f"Unknown task {name!r}.")
+    return Task.objects.create(name=name, owner=owner, kwargs=kwargs)
+
+
+def claim(limit):
+    """Marks up to `limit` of the oldest queued tasks as running. Returns their ids."""
+    task_ids = list(Task.objects.filter(status='queued').order_by('id').values_list('id', flat=True)[:limit])
+    if not task_ids:
+        return []
+    stamp = timezone.now()
+    Task.objects.filter(id__in=task_ids, status='queued').update(
+        status='running', started_at=stamp, heartbeat_at=stamp, attempts=F('attempts') + 1,
+    )
+    return list(Task.objects.filter(id__in=task_ids, status='running', started_at=stamp).values_list('id', flat=True))
+
+
+def run_task(task_id):
+    """Runs a claimed task and records its result or error. Returns the final status."""
+    task = Task.objects.select_related('owner').get(id=task_id)
+    try:
+        task.result = TASKS[task.name](task, **task.kwargs)
+        task.status = 'done'
+    except Exception as exc:  # noqa: BLE001 - a failed job is recorded on its task
+        logger.exception("Task #%s (%s) failed", task.id, task.name)
+        task.status = 'failed'
+        task.error = f"{type(exc).__name__}: {exc}"
+    task.finished_at = timezone.now()
+    task.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return task.status
+
+
+def run_in_worker(task_id):
+    """run_task() for pool processes, which end each task like a request ends."""
+    try:
+        return run_task(task_id)
+    finally:
+        close_old_connections()
+
+
+def heartbeat(task_ids):
+    """Renews the lease on tasks this worker is running."""
+    if task_ids:
+        Task.objects.filter(id__in=task_ids, status='running').update(heartbeat_at=timezone.now())
+
+
+def requeue(running):
+    """Requeues the given running tasks, failing those out of attempts. Returns the number requeued."""
+    running.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', error="The worker stopped while running this task.", finished_at=timezone.now(),
+    )
+    return running.filter(status='running').update(status='queued')
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """Requeues running tasks whose worker stopped sending heartbeats. Returns the number requeued."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return requeue(Task.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), status='running',
+    ))
+
+
+def purge(older_than_days=7):
+    """Deletes finished tasks (and their result files) older than `older_than_days`. Returns the number deleted."""
+    finished = Task.objects.filter(
+        status__in=FINISHED_STATUSES, finished_at__lt=timezone.now() - timedelta(days=older_than_days),
+    )
+    storage = result_storage()
+    for finished_task in finished.exclude(result=None).only('id', 'result'):
+        if result_file(finished_task):
+            storage.delete(finished_task.result['file'])
+    return finished.delete()[0]
+
+
+def result_storage():
+    return FileSystemStorage(location=settings.TASK_RESULTS_ROOT)
+
+
+def save_result_file(task, filename, content, content_type):
+    """Stores a job's output (bytes or a File) and returns the result dict pointing at it."""
+    if not isinstance(content, File):
+        content = ContentFile(content)
+    name = result_storage().save(f'{task.id}/{filename}', content)
+    return {'file': name, 'filename': filename, 'content_type': content_type}
+
+
+def result_file(task):
+    """The result dict of a task that produced a file, else None."""
+    result = task.result
+    return result if isinstance(result, dict) and result.get('file') else None
+
+
+def task_payload(task):
+    """Status JSON for polling a task."""
+    payload = {
+        'id': task.id,
+        'name': task.name,
+        'status': task.status,
+        'error': task.error,
+        'status_url': reverse('myapp:task_status', args=[task.id]),
+    }
+    if task.status == 'done' and result_file(task):
+        payload['download_url'] = reverse('myapp:task_download', args=[task.id])
+    return payload
+
+
+def _save_rows(task, rows, filename, content_type):
+    """Spools streamed export text to a temporary file, then stores it as the task result."""
+    with tempfile.TemporaryFile() as spool:
+        for row in rows:
+            spool.write(row.encode())
+        spool.seek(0)
+        return save_result_file(task, filename, File(spool), content_type)
+
+
+@task('qr_sheet')
+def qr_sheet(task, base_url, username, tables, export, fmt, filename):
+    # The worker pool already spreads jobs over the cores, so render in this process
+    data = qr.build_sheet(base_url, username, tables, export, fmt, workers=1)
+    return save_result_file(task, filename, data, 'application/pdf' if export == 'pdf' else 'application/zip')
+
+
+@task('export_orders')
+def export_orders(task, fmt, start, end, filename):
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    rows = order_history.export_rows(task.owner, fmt, start, end)
+    return _save_rows(task, rows, filename, order_history.EXPORT_FORMATS[fmt])
+
+
+@task('export_items')
+def export_items(task, fmt, filename):
+    return _save_rows(task, menu_io.export_rows(task.owner, fmt), filename, menu_io.FORMATS[fmt])
+
+
+@task('normalize_profile_image')
+def normalize_profile_image(task, name):
+    return apply_upload(task.owner_id, name)
+
+
+@receiver(profile_image_uploaded)
+def queue_profile_image(sender, profile, name, **kwargs):
+    """Normalises a new profile picture on the worker instead of in the upload request."""
+    enqueue('normalize_profile_image', owner=profile.user, name=name)
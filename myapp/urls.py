@@ -1,7 +1,12 @@
 # mysite/myapp/urls.py
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, api, async_views
+
+# NEW: mysite.asgi serves the customer ordering views as async views (see async_views.py);
+# WSGI keeps the sync ones
+customer_views = async_views if settings.ASYNC_CUSTOMER_VIEWS else views
 
 app_name = 'myapp'
 
@@ -10,19 +15,42 @@ urlpatterns = [
     path('management/', views.index, name='index'), 
     path('management/detail/<int:id>/', views.detail, name='detail'), 
     path('management/add/', views.create_item, name='create_item'),
+    # NEW: Bulk menu import / streaming export
+    path('management/items/import/', views.import_items, name='import_items'),
+    path('management/items/export/', views.export_items, name='export_items'),
     path('management/update/<int:id>/', views.update_item, name='item_update'),
     path('management/delete/<int:id>/', views.delete_item, name='item_delete'), 
     path('management/dashboard/', views.staff_dashboard, name='staff_dashboard'), 
     path('management/order/<int:order_id>/status/<str:new_status>/', views.update_order_status, name='update_order_status'),
+    # NEW: Advance many orders at once (POST)
+    path('management/orders/status/', views.batch_update_order_status, name='batch_update_order_status'),
+    # NEW: Live order feed (Server-Sent Events, served under mysite.asgi)
+    path('management/orders/events/', views.order_events, name='order_events'),
+    # NEW: Hourly / daily revenue chart data
+    path('management/analytics/revenue/', views.revenue_series, name='revenue_series'),
+    # NEW: Streaming order history export (CSV / JSON Lines)
+    path('management/orders/export/', views.export_orders, name='export_orders'),
     # NEW QR CODE ROUTE (No changes here)
     path('management/qr/<str:table_id>/', views.generate_qr_code, name='generate_qr_code'),
+    # NEW: Cached QR image and bulk table sheet (PDF/ZIP)
+    path('management/qr/<str:table_id>/image.<str:fmt>', views.qr_image, name='qr_image'),
+    path('management/qr-sheet/', views.qr_sheet, name='qr_sheet'),
+    # NEW: Background task status (polled) and result download
+    path('management/tasks/<int:task_id>/', views.task_status, name='task_status'),
+    path('management/tasks/<int:task_id>/download/', views.task_download, name='task_download'),
 
     # --- Customer Facing Views ---
-    path('', views.menu, name='menu'), # Public-facing Menu (Unfiltered/All)
+    path('', customer_views.menu, name='menu'), # Public-facing Menu (Unfiltered/All)
     # UPDATED: Added <str:username>/ to allow filtering the menu by the restaurant owner
-    path('menu/<str:username>/<str:table_id>/', views.menu, name='menu_with_table'), # QR Code Landing Spot
-    path('cart/', views.view_cart, name='view_cart'),
-    path('cart/add/<int:item_id>/', views.add_to_cart, name='add_to_cart'),
-    path('checkout/', views.checkout, name='checkout'),
-    path('checkout/success/', views.checkout, name='checkout_success'), 
+    path('menu/<str:username>/<str:table_id>/', customer_views.menu, name='menu_with_table'), # QR Code Landing Spot
+    path('cart/', customer_views.view_cart, name='view_cart'),
+    path('cart/add/<int:item_id>/', customer_views.add_to_cart, name='add_to_cart'),
+    path('checkout/', customer_views.checkout, name='checkout'),
+    path('checkout/success/', customer_views.checkout, name='checkout_success'), 
+
+    # --- NEW: JSON API (v1) for the customer flow ---
+    path('api/v1/menu/<str:username>/', api.menu, name='api_menu'),
+    path('api/v1/cart/', api.cart, name='api_cart'),
+    path('api/v1/cart/items/<int:item_id>/', api.cart_item, name='api_cart_item'),
+    path('api/v1/orders/', api.orders, name='api_orders'),
 ]
\ No newline at end of file
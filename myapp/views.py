@@ -1,19 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, F, DecimalField # Used for dashboard reports
+from django.db.models import Sum # Used for dashboard reports
 from django.contrib import messages 
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
 
-# QR Code Libraries
-import qrcode
-from io import BytesIO
-from base64 import b64encode
+import asyncio
+import json
+from datetime import date
 
 # Import models and forms
-from .models import Item, Order, OrderItem
-from .forms import ItemForm
+from .models import Item, Order, ItemSalesDaily, ArchivedOrder, Task, ACTIVE_STATUSES
+from .forms import ItemForm, ItemImportUploadForm
+from .menu_cache import get_menu_version, get_menu_items
+from .events import get_broker, order_payload
+from .cart import load_cart, save_cart, add_item, hydrate_cart
+from .ordering import place_order, ItemsUnavailable, transition_orders, bulk_transition, InvalidTransition
+from . import analytics, qr, menu_io, order_history, search, tasks
+
+# QR images only change if the menu URL does, so browsers may keep them for a day
+QR_IMAGE_MAX_AGE = 60 * 60 * 24
 
 # --- Admin/Staff Views (Now Multi-Tenant by filtering by request.user) ---
 
@@ -21,7 +32,8 @@ from .forms import ItemForm
 def index(request):
     """Staff Menu Management List (Shows ONLY items created by the logged-in user)"""
     # FILTER: Only show items created by the current user
-    item_list = Item.objects.filter(user_name=request.user)
+    # UPDATED: The card's "Added by" name comes from the same query, not one query per item
+    item_list = Item.objects.filter(user_name=request.user).select_related('user_name')
     context = {
         'item_list':item_list
     }
@@ -35,15 +47,40 @@ def detail(request, id):
       
 @login_required(login_url='login')
 def create_item(request):
-    form = ItemForm(request.POST or None)
+    # ASSIGN: Set the creator of the item to the current user (before validation, for the name check)
+    form = ItemForm(request.POST or None, instance=Item(user_name=request.user))
     if request.method == 'POST' and form.is_valid():
-        item = form.save(commit=False)
-        # ASSIGN: Set the creator of the item to the current user
-        item.user_name = request.user
-        item.save()
+        form.save()
         return redirect('myapp:index')
     return render(request, 'myapp/item_form.html', {'form': form, 'title': 'Add New Food Item'})
 
+@login_required(login_url='login')
+def import_items(request):
+    """NEW: Bulk menu upload (CSV or JSON Lines), upserted by item name into the user's menu."""
+    form = ItemImportUploadForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == 'POST' and form.is_valid():
+        upload = form.cleaned_data['file']
+        result = menu_io.import_file(request.user, upload.file, menu_io.detect_format(upload.name))
+        if result['imported']:
+            messages.success(request, f"Imported {result['imported']} items.")
+        if result['failed']:
+            messages.warning(request, f"{result['failed']} rows had errors and were skipped.")
+    return render(request, 'myapp/item_import.html', {'form': form, 'result': result})
+
+@login_required(login_url='login')
+def export_items(request):
+    """NEW: Streams the user's menu as CSV or JSON Lines (?format=jsonl)."""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in menu_io.FORMATS:
+        raise Http404("Unknown export format.")
+    filename = f"menu-{request.user.username}.{fmt}"
+    if request.GET.get('background'):
+        return _run_in_background(request, 'export_items', fmt=fmt, filename=filename)
+    response = StreamingHttpResponse(menu_io.export_rows(request.user, fmt), content_type=menu_io.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required(login_url='login')
 def update_item(request, id):
     # FILTER: Only get item if it belongs to the current user
@@ -69,32 +106,30 @@ def delete_item(request, id):
 def staff_dashboard(request):
     """Dashboard for staff to view orders, revenue, and item sales FOR THEIR RESTAURANT."""
     
-    # 1. Base query: Orders that contain items owned by the current user
-    all_orders_for_user = Order.objects.filter(
-        orderitem__item__user_name=request.user
-    ).distinct()
+    # 1. Base query: Orders placed with the current user's restaurant
+    # UPDATED: Scoped by the denormalised Order.owner column instead of a
+    # three-table join with DISTINCT through OrderItem and Item.
+    all_orders_for_user = Order.objects.filter(owner=request.user)
 
     # 2. Active Orders
-    active_orders = all_orders_for_user.filter(
-        status__in=['Pending', 'Preparing']
-    ).order_by('-created_at')
+    # UPDATED: Listed from the item summary stored on each order at checkout; no OrderItem query
+    active_orders = all_orders_for_user.filter(status__in=ACTIVE_STATUSES).order_by('-created_at')
     
-    # 3. Totals and Revenue
-    total_orders_count = all_orders_for_user.count()
-    total_revenue = all_orders_for_user.filter(
-        is_paid=True
-    ).aggregate(
-        total=Sum('total_price')
-    )['total'] or 0.00
+    # 3. Totals (orders moved out by `archive_orders` still count towards "all time")
+    total_orders_count = all_orders_for_user.count() + ArchivedOrder.objects.filter(owner=request.user).count()
     
-    # 4. Item Sales Report (Filter OrderItems by the Item's owner)
-    item_sales_report = OrderItem.objects.filter(
-        item__user_name=request.user,
-        order__is_paid=True # Only count paid orders for revenue/sales report
+    # 4. Item Sales Report
+    # UPDATED: Read from the ItemSalesDaily rollup (maintained in update_order_status)
+    # instead of scanning every paid OrderItem on each page load.
+    item_sales_report = ItemSalesDaily.objects.filter(
+        owner=request.user
     ).values('item_name').annotate(
         total_quantity=Sum('quantity'),
-        total_revenue=Sum(F('item_price') * F('quantity'), output_field=DecimalField())
-    ).order_by('-total_quantity')
+        total_revenue=Sum('revenue')
+    ).filter(total_quantity__gt=0).order_by('-total_quantity')
+
+    # Revenue of paid orders equals the sum of their lines, so it comes from the rollup too
+    total_revenue = sum((row['total_revenue'] for row in item_sales_report), 0) or 0.00
     
     context = {
         'active_orders': active_orders,
@@ -105,114 +140,353 @@ def staff_dashboard(request):
     return render(request, 'myapp/staff_dashboard.html', context)
 
 
+@login_required(login_url='login')
+def export_orders(request):
+    """NEW: Streams the restaurant's order lines (live and archived) for ?start=&end= (YYYY-MM-DD, inclusive)."""
+    fmt = request.GET.get('format', 'csv')
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return HttpResponse("start and end must be dates (YYYY-MM-DD).", status=400, content_type='text/plain')
+    if fmt not in order_history.EXPORT_FORMATS:
+        return HttpResponse("Unknown export format.", status=400, content_type='text/plain')
+
+    period = f"{start or 'start'}_{end or 'today'}"
+    filename = f"orders-{request.user.username}-{period}.{fmt}"
+    if request.GET.get('background'):
+        return _run_in_background(
+            request, 'export_orders', fmt=fmt, filename=filename,
+            start=start and start.isoformat(), end=end and end.isoformat(),
+        )
+    response = StreamingHttpResponse(
+        order_history.export_rows(request.user, fmt, start, end), content_type=order_history.EXPORT_FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required(login_url='login')
+def revenue_series(request):
+    """NEW: Chart JSON of the restaurant's paid revenue for ?period=hour|day over the last ?buckets=N."""
+    period = request.GET.get('period', 'hour')
+    if period not in analytics.PERIODS:
+        return JsonResponse({'error': "period must be 'hour' or 'day'."}, status=400)
+    try:
+        buckets = int(request.GET.get('buckets', analytics.DEFAULT_BUCKETS[period]))
+    except ValueError:
+        buckets = 0
+    if not 1 <= buckets <= analytics.MAX_BUCKETS[period]:
+        return JsonResponse({'error': f"buckets must be 1 to {analytics.MAX_BUCKETS[period]}."}, status=400)
+    response = JsonResponse(analytics.revenue_series(request.user, period, buckets))
+    # Changes with every paid order, so never reuse a stored copy
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 @login_required(login_url='login')
 def generate_qr_code(request, table_id):
-    """Generates a QR code for a specific table URL."""
+    """Printable QR code page for a specific table URL."""
     # UPDATED: Include the staff user's username in the URL so the menu view can filter.
     username = request.user.username
     relative_url = reverse('myapp:menu_with_table', kwargs={'username': username, 'table_id': table_id})
     full_url = request.build_absolute_uri(relative_url)
 
-    # ... (rest of the QR code generation logic remains the same)
-
-    # 1. Create QR code object
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-    qr.add_data(full_url)
-    qr.make(fit=True)
-
-    # 2. Create an image from the QR code and save to a buffer
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    
-    # 3. Encode the image data to Base64
-    qr_code_base64 = b64encode(buffer.getvalue()).decode('utf-8')
-
+    # UPDATED: The image is served (and cached) by qr_image instead of being inlined as base64
     context = {
         'table_id': table_id,
-        'qr_code_data': qr_code_base64,
+        'qr_image_url': reverse('myapp:qr_image', kwargs={'table_id': table_id, 'fmt': 'png'}),
         'full_url': full_url
     }
     return render(request, 'myapp/qr_generator.html', context)
 
 @login_required(login_url='login')
-def update_order_status(request, order_id, new_status):
-    # FILTER: Only allow updating orders that contain items owned by the current user
-    order = get_object_or_404(
-        Order.objects.filter(orderitem__item__user_name=request.user).distinct(), 
-        id=order_id
+def qr_image(request, table_id, fmt):
+    """NEW: QR code image for a table, rendered once and then served from the cache."""
+    if fmt not in qr.FORMATS:
+        raise Http404("Unknown QR image format.")
+    relative_url = reverse('myapp:menu_with_table', kwargs={'username': request.user.username, 'table_id': table_id})
+    data, digest = qr.get_qr(request.build_absolute_uri(relative_url), fmt)
+
+    # The bytes never change for a given URL, so the digest is a stable ETag
+    etag = quote_etag(digest)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(data, content_type=qr.FORMATS[fmt])
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=QR_IMAGE_MAX_AGE)
+    return response
+
+@login_required(login_url='login')
+def qr_sheet(request):
+    """NEW: Every table's QR code in one printable PDF (or a ZIP of images) for ?tables=1-20."""
+    try:
+        tables = qr.parse_tables(request.GET.get('tables', ''))
+    except ValueError as error:
+        return HttpResponse(str(error), status=400, content_type='text/plain')
+    export = request.GET.get('export', 'pdf')
+    fmt = request.GET.get('format', 'png')
+    if export not in ('pdf', 'zip') or fmt not in qr.FORMATS:
+        return HttpResponse("Unknown export or image format.", status=400, content_type='text/plain')
+
+    base_url = request.build_absolute_uri('/')
+    filename = f"table-qr-codes.{export}"
+    if request.GET.get('background'):
+        return _run_in_background(
+            request, 'qr_sheet', base_url=base_url, username=request.user.username,
+            tables=tables, export=export, fmt=fmt, filename=filename,
+        )
+    data = qr.build_sheet(base_url, request.user.username, tables, export, fmt)
+    content_type = 'application/pdf' if export == 'pdf' else 'application/zip'
+    response = HttpResponse(data, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# --- NEW: Background tasks (see tasks.py). The export and QR sheet views queue a task
+# when called with ?background=1; the page then polls task_status and downloads the file.
+
+def _run_in_background(request, name, **kwargs):
+    """Queues a job for the task worker and answers 202 with its status JSON."""
+    task = tasks.enqueue(name, owner=request.user, **kwargs)
+    return JsonResponse(tasks.task_payload(task), status=202)
+
+@login_required(login_url='login')
+def task_status(request, task_id):
+    """NEW: Status JSON for one of the user's background tasks."""
+    task = get_object_or_404(Task, id=task_id, owner=request.user)
+    return JsonResponse(tasks.task_payload(task))
+
+@login_required(login_url='login')
+def task_download(request, task_id):
+    """NEW: The file a finished background task produced."""
+    task = get_object_or_404(Task, id=task_id, owner=request.user, status='done')
+    result = tasks.result_file(task)
+    if result is None:
+        raise Http404("This task has no file.")
+    return FileResponse(
+        tasks.result_storage().open(result['file']), as_attachment=True,
+        filename=result['filename'], content_type=result['content_type'],
     )
 
-    if new_status in [choice[0] for choice in Item.STATUS_CHOICES]:
-        order.status = new_status
-        if new_status == 'Completed':
-            order.is_paid = True
-        order.save()
+def _status_change(order):
+    """The JSON for one applied transition, shaped like the live feed's order_status event."""
+    return {'order': order_payload(order), 'revenue_delta': str(order.revenue_delta)}
+
+def _wants_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
+
+# UPDATED: POST-only, and applied as a conditional UPDATE (see ordering.transition_orders).
+# The form sends the status the page showed as `expected`; if the order has moved on
+# since, nothing is written and the response is 409 with the order's current state.
+@login_required(login_url='login')
+@require_POST
+def update_order_status(request, order_id, new_status):
+    expected = request.POST.get('expected', '')
+    # FIX: Without `expected` the UPDATE can't match, so say why instead of "can't go from  to ..."
+    if not expected:
+        error = "expected status is required."
+        if _wants_json(request):
+            return JsonResponse({'error': error}, status=400)
+        return HttpResponse(error, status=400, content_type='text/plain')
+    try:
+        changed = transition_orders(request.user, [order_id], expected, new_status)
+    except InvalidTransition as error:
+        if _wants_json(request):
+            return JsonResponse({'error': str(error)}, status=400)
+        messages.error(request, str(error))
+        return redirect('myapp:staff_dashboard')
+
+    if changed:
+        if _wants_json(request):
+            return JsonResponse(_status_change(changed[0]))
+        return redirect('myapp:staff_dashboard')
+
+    # FILTER: Only the restaurant's own orders
+    order = get_object_or_404(Order, id=order_id, owner=request.user)
+    error = f"Order #{order.id} is already {order.status}."
+    if _wants_json(request):
+        return JsonResponse({'error': error, 'order': order_payload(order)}, status=409)
+    messages.warning(request, error)
     return redirect('myapp:staff_dashboard')
 
+# NEW: Bulk kitchen actions. One UPDATE per request, whichever orders it covers.
+@login_required(login_url='login')
+@require_POST
+def batch_update_order_status(request):
+    """Moves many orders to POST `status`. Returns the orders that changed and the ids skipped.
+
+    Which orders: `order_ids` (repeated) with `expected`, their current status;
+    or, without `expected`, whichever active orders can make the change among
+    `order_ids`, one `table`, or `all=1`.
+    """
+    status = request.POST.get('status', '')
+    expected = request.POST.get('expected')
+    table = request.POST.get('table') or None
+    try:
+        order_ids = [int(order_id) for order_id in request.POST.getlist('order_ids')] or None
+        if expected is not None:
+            changed = transition_orders(request.user, order_ids or [], expected, status)
+        elif order_ids or table or request.POST.get('all') == '1':
+            changed = bulk_transition(request.user, status, order_ids=order_ids, table_number=table)
+        else:
+            raise ValueError("Choose orders, a table or all active orders.")
+    except (ValueError, InvalidTransition) as error:
+        if _wants_json(request):
+            return JsonResponse({'error': str(error)}, status=400)
+        messages.error(request, str(error))
+        return redirect('myapp:staff_dashboard')
+
+    if not _wants_json(request):
+        messages.success(request, f"{len(changed)} order{'s' if len(changed) != 1 else ''} moved to {status}.")
+        return redirect('myapp:staff_dashboard')
+    changed_ids = {order.id for order in changed}
+    return JsonResponse({
+        'changes': [_status_change(order) for order in changed],
+        'skipped': [order_id for order_id in order_ids or [] if order_id not in changed_ids],
+    })
+
+
+# NEW: Seconds between keep-alive comments on an idle event stream
+ORDER_EVENTS_HEARTBEAT = 15
+
+@login_required(login_url='login')
+async def order_events(request):
+    """Server-Sent Events stream of order created/status events for the logged-in restaurant."""
+    if not hasattr(request, 'scope'):
+        # A never-ending stream would tie up a WSGI worker; 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    broker = get_broker()
+    queue = broker.subscribe(user.id)
+
+    async def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=ORDER_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(user.id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 
 # --- Customer Facing Views (Public menu now filters by item availability, NOT ownership) ---
 
-def menu(request, username=None, table_id=None):
-    """Public view for customers, filters items by is_available=True AND optionally by a restaurant/user if provided in the URL."""
+def _menu_filters(request):
+    """Search/filter/page parameters for search.menu_page(). Invalid numbers are ignored."""
+    def number(name):
+        value = request.GET.get(name, '')
+        # FIX: isdigit() also accepts e.g. '²', which int() rejects; 18 digits still fit a SQLite integer
+        return int(value) if value.isascii() and value.isdecimal() and len(value) <= 18 else None
+
+    return {
+        'text': request.GET.get('q', '').strip()[:100],
+        'min_price': number('min_price'),
+        'max_price': number('max_price'),
+        'after': number('after'),
+    }
+
+def _remember_table(request, username, table_id):
+    """Keeps the scanned table and its menu URL in the (already loaded) session."""
     if table_id:
-        request.session['table_number'] = table_id
         # Store the current menu URL for redirection after adding an item to cart
         # UPDATED: Pass the username to the redirect URL
-        request.session['menu_redirect_url'] = reverse('myapp:menu_with_table', kwargs={'username': username, 'table_id': table_id})
+        menu_redirect_url = reverse('myapp:menu_with_table', kwargs={'username': username, 'table_id': table_id})
+        # NEW: Only touch the session when the table changes, so a rescan doesn't write the session row
+        if request.session.get('table_number') != table_id or request.session.get('menu_redirect_url') != menu_redirect_url:
+            request.session['table_number'] = table_id
+            request.session['menu_redirect_url'] = menu_redirect_url
     else:
         # Clear the table-specific redirect URL if accessing the root menu
         if 'menu_redirect_url' in request.session:
             del request.session['menu_redirect_url']
-    
-    # Filter items:
-    # 1. Always filter by is_available=True
-    item_list = Item.objects.filter(is_available=True)
-    
-    # 2. If a username is provided in the URL (from a QR scan), filter by that user's items.
-    if username:
-        item_list = item_list.filter(user_name__username=username) # Filter by the username from the URL
+    return request.session.get('table_number', 'N/A')
+
+def _menu_validators(request, username, table_number, version):
+    """Returns (etag, not_modified_response) for the menu's conditional GET.
+
+    The menu version only changes when an Item is written, so a rescan of the
+    same table can be answered with a 304. Skipped (etag None) while a flash
+    message (e.g. "added to cart") is pending, since that page differs.
+    """
+    if len(messages.get_messages(request)):
+        return None, None
+    etag = quote_etag(f"{username or '*'}-{table_number}-{version}-{request.GET.urlencode()}")
+    return etag, get_conditional_response(request, etag=etag, last_modified=int(version))
+
+def _menu_response(request, context, etag, version):
+    response = render(request, 'myapp/menu.html', context)
+    if etag:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(int(version))
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _next_page_url(request, next_cursor):
+    next_params = request.GET.copy()
+    next_params['after'] = next_cursor
+    return f"?{next_params.urlencode()}"
+
+@ensure_csrf_cookie # NEW: The menu's add-to-cart buttons call the JSON API with this token
+def menu(request, username=None, table_id=None):
+    """Public view for customers, filters items by is_available=True AND optionally by a restaurant/user if provided in the URL."""
+    table_number = _remember_table(request, username, table_id)
+
+    # NEW: Conditional GET (see _menu_validators)
+    version = get_menu_version(username)
+    etag, not_modified = _menu_validators(request, username, table_number, version)
+    if not_modified is not None:
+        return not_modified
 
+    # NEW: ?q= (full-text), ?min_price= / ?max_price= and ?after=<last id> (next page)
+    filters = _menu_filters(request)
     context = {
-        'item_list': item_list,
-        'table_number': request.session.get('table_number', 'N/A')
+        'table_number': table_number,
+        'filters': filters,
     }
-    return render(request, 'myapp/menu.html', context)
+    if username and not any(filters.values()):
+        # Items are filtered by is_available=True and, when a username is provided in the
+        # URL (from a QR scan), by that user's items. NEW: Rows are cached per restaurant
+        # and menu version (see menu_cache.py)
+        context['item_list'] = get_menu_items(username, version)
+    else:
+        # NEW: The all-restaurants menu (and any search) is served a page at a time
+        context['item_list'], next_cursor = search.menu_page(username, **filters)
+        if next_cursor:
+            context['next_page_url'] = _next_page_url(request, next_cursor)
+    return _menu_response(request, context, etag, version)
 
 def add_to_cart(request, item_id):
-    """Handles adding item to session-based cart, redirects back to menu with a message."""
-    item = get_object_or_404(Item, id=item_id)
-    cart = request.session.get('cart', {})
-    
-    item_id_str = str(item_id)
+    """Handles adding item to the cookie-based cart, redirects back to menu with a message."""
+    item = get_object_or_404(Item.objects.only('id', 'item_name'), id=item_id)
+    # UPDATED: The cart is a compact {item_id: quantity} signed cookie (see cart.py),
+    # so adding an item no longer writes the session table.
+    cart = load_cart(request)
     
-    if item_id_str in cart:
-        cart[item_id_str]['quantity'] += 1
+    if add_item(cart, item.id):
+        # Add success message (Notification type)
+        messages.success(request, f"{item.item_name} added to cart!")
     else:
-        cart[item_id_str] = {
-            'name': item.item_name,
-            'price': float(item.item_price),
-            'quantity': 1,
-            'description': item.item_description # <--- ADDED
-        }
-        
-    request.session['cart'] = cart
-    
-    # Add success message (Notification type)
-    messages.success(request, f"{item.item_name} added to cart!")
+        messages.warning(request, "Your cart is full. Please place your order first.")
 
     # Redirect back to the menu (main or table-specific)
     menu_redirect_url = request.session.get('menu_redirect_url', reverse('myapp:menu'))
-    return redirect(menu_redirect_url) # <--- REDIRECT CHANGED
+    return save_cart(redirect(menu_redirect_url), cart) # <--- REDIRECT CHANGED
 
 def view_cart(request):
     """Displays the current cart contents."""
-    cart = request.session.get('cart', {})
-    cart_items = cart.values()
-    cart_total = sum(item['price'] * item['quantity'] for item in cart_items)
+    # UPDATED: Names and prices are read from the current Item rows in one query
+    cart_lines, cart_total = hydrate_cart(load_cart(request))
     
     context = {
-        'cart_items': cart_items,
+        'cart_items': cart_lines,
         'cart_total': cart_total,
         'table_number': request.session.get('table_number', 'N/A')
     }
@@ -220,42 +494,28 @@ def view_cart(request):
 
 def checkout(request):
     """Creates a new Order from the cart and clears the cart."""
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
     if not cart:
         return redirect('myapp:menu')
 
     if request.method == 'POST':
-        cart_total = sum(item['price'] * item['quantity'] for item in cart.values())
-        
-        new_order = Order.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            table_number=request.session.get('table_number'),
-            total_price=cart_total,
-            status='Pending',
-            is_paid=False
-        )
+        # UPDATED: Checkout runs in one transaction with a single batched Item lookup
+        # and current prices (see ordering.place_order); unavailable items are rejected.
+        try:
+            new_orders, order_items = place_order(request, cart)
+        except ItemsUnavailable as unavailable:
+            for item_id_str in unavailable.item_ids:
+                del cart[item_id_str]
+            messages.error(request, f"Sorry, no longer available: {', '.join(unavailable.names) or 'some items'}. Please review your order.")
+            return save_cart(redirect('myapp:view_cart'), cart)
 
-        order_items = []
-        for item_id_str, item_data in cart.items():
-            item_id = int(item_id_str)
-            item_instance = Item.objects.filter(id=item_id).first()
-            order_items.append(OrderItem(
-                order=new_order,
-                item=item_instance,
-                item_name=item_data['name'],
-                item_price=item_data['price'],
-                quantity=item_data['quantity']
-            ))
-        OrderItem.objects.bulk_create(order_items)
-        
-        del request.session['cart']
-        
         # FIX: Get the correct menu redirect URL from session, default to generic menu
         menu_redirect_url = request.session.get('menu_redirect_url', reverse('myapp:menu'))
         
-        return render(request, 'myapp/checkout_success.html', {
-            'order': new_order,
+        response = render(request, 'myapp/checkout_success.html', {
+            'orders': new_orders,
             'menu_redirect_url': menu_redirect_url # Pass URL to template
         })
+        return save_cart(response, {})
         
     return redirect('myapp:view_cart')
\ No newline at end of file
@@ -3,6 +3,17 @@ ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live kitchen order feed (``myapp:order_events``) is a long-lived Server-Sent
+Events stream and needs this entry point, e.g.::
+
+    uvicorn mysite.asgi:application
+
+It also serves the customer ordering views (menu, cart, checkout) as async
+views, see myapp/async_views.py. Set ASYNC_CUSTOMER_VIEWS=0 to keep the sync
+ones. To compare the two paths::
+
+    python manage.py bench_server_modes
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +23,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+os.environ.setdefault('ASYNC_CUSTOMER_VIEWS', '1')
 
 application = get_asgi_application()
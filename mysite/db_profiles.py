@@ -0,0 +1,79 @@
+"""
+Database profiles for mysite, chosen with the DB_PROFILE environment variable.
+
+``sqlite`` (default)
+    One file (SQLITE_PATH, default BASE_DIR/db.sqlite3) in WAL mode with
+    synchronous=NORMAL, so readers never block the writer and commits don't
+    fsync every transaction. WAL is a property of the database file, set once
+    with ``manage.py sqlite_journal_mode``. Writers queue on a 20s busy timeout and
+    connections are kept for DB_CONN_MAX_AGE seconds (default 60). Fine for a
+    single venue per instance.
+``sqlite-basic``
+    The previous untuned SQLite setup (rollback journal, a new connection
+    per request). Kept for comparison in ``manage.py bench_db_profiles``.
+``postgres``
+    PostgreSQL (DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD,
+    DATABASE_HOST, DATABASE_PORT) with a psycopg connection pool of
+    DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections per process. Needs
+    ``pip install "psycopg[binary,pool]"``.
+
+The per-connection SQLite PRAGMAs in SQLITE_PRAGMAS are applied to every new
+connection by myapp.db_tuning. The journal mode (JOURNAL_MODES, settings'
+SQLITE_JOURNAL_MODE) persists in the file, so it is never set implicitly:
+running a command or the tests must not convert the tracked database.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('sqlite', 'sqlite-basic', 'postgres')
+
+TUNED_SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+}
+# Journal mode each SQLite profile expects its database file to be in
+JOURNAL_MODES = {'sqlite': 'wal', 'sqlite-basic': 'delete'}
+
+
+def database_profile(profile, env, base_dir):
+    """Returns (DATABASES, SQLITE_PRAGMAS) for a profile name and an environment mapping."""
+    if profile == 'postgres':
+        return {
+            'default': {
+                'ENGINE': 'django.db.backends.postgresql',
+                'NAME': env.get('DATABASE_NAME', 'foodapp'),
+                'USER': env.get('DATABASE_USER', 'foodapp'),
+                'PASSWORD': env.get('DATABASE_PASSWORD', ''),
+                'HOST': env.get('DATABASE_HOST', 'localhost'),
+                'PORT': env.get('DATABASE_PORT', '5432'),
+                # The pool keeps connections open; Django requires CONN_MAX_AGE = 0 with it
+                'CONN_MAX_AGE': 0,
+                'OPTIONS': {
+                    'pool': {
+                        'min_size': int(env.get('DB_POOL_MIN_SIZE', 2)),
+                        'max_size': int(env.get('DB_POOL_MAX_SIZE', 10)),
+                        'timeout': 10,
+                    },
+                },
+            }
+        }, {}
+
+    if profile in ('sqlite', 'sqlite-basic'):
+        tuned = profile == 'sqlite'
+        return {
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': env.get('SQLITE_PATH', base_dir / 'db.sqlite3'),
+                'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)) if tuned else 0,
+                'CONN_HEALTH_CHECKS': tuned,
+                'OPTIONS': {
+                    # Take the write lock when a transaction starts, so concurrent checkouts
+                    # queue on the busy timeout instead of failing with "database is locked"
+                    # when a read transaction can't be upgraded to a write.
+                    'transaction_mode': 'IMMEDIATE',
+                    # Seconds; this is SQLite's busy_timeout
+                    'timeout': 20,
+                },
+            }
+        }, dict(TUNED_SQLITE_PRAGMAS) if tuned else {}
+
+    raise ImproperlyConfigured(f"DB_PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}.")
@@ -0,0 +1,195 @@
+# mysite/mysite/images.py
+
+"""Content-addressed media store for menu item and profile images.
+
+Shared by myapp (menu items, the media view) and users (profile pictures), so
+it lives in the project package rather than in either app.
+
+Images are written once under MEDIA_ROOT as ``<dir>/<sha256>.<ext>`` with
+WebP size variants next to them (``<dir>/<sha256>_w<width>.webp``). Because
+the file name is the hash of the content, identical images are stored once and
+the URLs never change, so they can be cached by browsers indefinitely.
+
+Menu item variants are generated when the image is stored. Profile pictures
+are normalised first (EXIF orientation applied and metadata dropped,
+downscaled), and their variants are only generated when first requested,
+by the media view (see myapp/media.py).
+"""
+
+import binascii
+import hashlib
+import re
+from base64 import b64decode
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+ITEM_IMAGE_DIR = 'items'
+PROFILE_IMAGE_DIR = 'profile_pictures'
+
+# Widths of the pre-generated WebP variants (card thumbnail, modal/detail view)
+VARIANT_WIDTHS = (400, 800)
+# Longest side of a stored profile picture, and its (lazy) avatar variant widths
+PROFILE_IMAGE_SIZE = 512
+PROFILE_VARIANT_WIDTHS = (128, 256)
+# Larger uploads are refused before they are decoded
+MAX_IMAGE_PIXELS = 50_000_000
+
+# Variant widths the media view may generate on request, per store directory
+LAZY_VARIANT_WIDTHS = {
+    ITEM_IMAGE_DIR: VARIANT_WIDTHS,
+    PROFILE_IMAGE_DIR: PROFILE_VARIANT_WIDTHS,
+}
+
+_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+_STORED_NAME = re.compile(r'^[\w-]+/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+_VARIANT_NAME = re.compile(r'^(?P<dir>[\w-]+)/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})_w(?P<width>\d+)\.webp$')
+
+
+def decode_data_uri(uri):
+    """Returns the raw bytes of a base64 ``data:`` URI, or None if it is not one."""
+    if not uri or not uri.startswith('data:'):
+        return None
+    header, _, payload = uri.partition(',')
+    if not header.endswith(';base64'):
+        return None
+    try:
+        return b64decode(payload)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def is_stored_image(name):
+    """True if `name` is a path inside the content-addressed store (not a URL or data-URI)."""
+    return bool(name) and name.startswith(ITEM_IMAGE_DIR + '/')
+
+
+def is_content_addressed(name):
+    """True for an image or variant written by this module; its bytes never change."""
+    return bool(_STORED_NAME.match(name) or _VARIANT_NAME.match(name))
+
+
+def variant_name(name, width):
+    stem = name.rsplit('.', 1)[0]
+    return f'{stem}_w{width}.webp'
+
+
+def _save_once(name, data):
+    """Saves bytes under `name` unless it already exists (a concurrent writer's copy is discarded)."""
+    if default_storage.exists(name):
+        return
+    saved = default_storage.save(name, ContentFile(data))
+    if saved != name:
+        # Another request stored the same content first; keep theirs
+        default_storage.delete(saved)
+
+
+def _save_variant(image, name, width):
+    variant = image.copy()
+    if variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA' if 'transparency' in variant.info else 'RGB')
+    variant.thumbnail((width, width))
+    buffer = BytesIO()
+    variant.save(buffer, format='WEBP', quality=80, method=4)
+    _save_once(variant_name(name, width), buffer.getvalue())
+
+
+def _store(data, image, directory):
+    digest = hashlib.sha256(data).hexdigest()
+    name = f'{directory}/{digest[:2]}/{digest}.{_EXTENSIONS.get(image.format, "img")}'
+    _save_once(name, data)
+    return name
+
+
+def open_image(data):
+    """Opens image bytes, reading only the header. Raises ValueError for unreadable or oversized images."""
+    try:
+        image = Image.open(BytesIO(data))
+    except Image.DecompressionBombError as error:
+        raise ValueError("Image is too large.") from error
+    except (UnidentifiedImageError, OSError) as error:
+        raise ValueError("Not a readable image.") from error
+    # Checked before any pixels are decoded
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise ValueError("Image is too large.")
+    return image
+
+
+def store_image(data):
+    """Stores image bytes under their content hash and returns the storage name.
+
+    Returns None if the bytes are not a readable image of at most
+    MAX_IMAGE_PIXELS. Storing the same bytes twice is a no-op that returns the
+    same name.
+    """
+    try:
+        image = open_image(data)
+        image.load()
+    except (ValueError, OSError, Image.DecompressionBombError):
+        return None
+
+    name = _store(data, image, ITEM_IMAGE_DIR)
+    for width in VARIANT_WIDTHS:
+        if not default_storage.exists(variant_name(name, width)):
+            _save_variant(image, name, width)
+    return name
+
+
+def normalize_image(data, max_size):
+    """Re-encodes an uploaded image upright, without metadata, no larger than `max_size` pixels a side.
+
+    Returns PNG bytes if the image has transparency, else JPEG.
+    Raises ValueError for unreadable or oversized images.
+    """
+    image = open_image(data)
+    # JPEGs are decoded at a reduced scale (1/2 to 1/8) when that still covers max_size
+    image.draft('RGB', (max_size, max_size))
+    try:
+        # Applies the EXIF orientation; the pixels are re-encoded below without any metadata
+        image = ImageOps.exif_transpose(image)
+    except OSError as error:
+        raise ValueError("Not a readable image.") from error
+    image.thumbnail((max_size, max_size))
+    buffer = BytesIO()
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image.convert('RGBA').save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+    image.convert('RGB').save(buffer, format='JPEG', quality=85, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def store_profile_image(normalized):
+    """Stores profile picture bytes from normalize_image() by content hash. Returns the storage name.
+
+    Its avatar variants are left to the media view.
+    """
+    return _store(normalized, Image.open(BytesIO(normalized)), PROFILE_IMAGE_DIR)
+
+
+def create_lazy_variant(path):
+    """Generates a missing variant of a stored image, if `path` names an allowed one. Returns True if it exists now."""
+    match = _VARIANT_NAME.match(path)
+    if not match or int(match['width']) not in LAZY_VARIANT_WIDTHS.get(match['dir'], ()):
+        return False
+    stem = f"{match['dir']}/{match['digest'][:2]}/{match['digest']}"
+    for ext in _EXTENSIONS.values():
+        if default_storage.exists(f'{stem}.{ext}'):
+            name = f'{stem}.{ext}'
+            break
+    else:
+        return False
+    with default_storage.open(name) as original:
+        image = Image.open(original)
+        image.load()
+    _save_variant(image, name, int(match['width']))
+    return True
+
+
+def store_data_uri(uri):
+    """Moves an inline data-URI into the store. Returns the storage name, or None."""
+    data = decode_data_uri(uri)
+    if data is None:
+        return None
+    return store_image(data)
@@ -11,7 +11,13 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import atexit
 import os
+import shutil
+import sys
+import tempfile
+
+from .db_profiles import JOURNAL_MODES, database_profile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,6 +32,13 @@ SECRET_KEY = 'django-insecure-_bjox2(0p47j6z@4pz@pyv56fq##r#^%%90j^!0)(^1wg6a^_j
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# NEW: True under `manage.py test`, which must not share state with the dev server. Such runs
+# get a scratch directory of their own (removed on exit) for the files they would otherwise share.
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    TESTING_DIR = tempfile.mkdtemp(prefix='foodapp-test-')
+    atexit.register(shutil.rmtree, TESTING_DIR, True)
+
 ALLOWED_HOSTS = []
 
 
@@ -43,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # NEW: Outermost, so its timing and query count include every other middleware
+    'myapp.instrumentation.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,31 +73,98 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # UPDATED: Explicit cached loader (templates compiled once per process). With
+            # DEBUG on, Django's autoreloader still clears it when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'mysite.wsgi.application'
+ASGI_APPLICATION = 'mysite.asgi.application'
+
+# NEW: Route the customer ordering views (menu, cart, checkout) to their async versions
+# (myapp/async_views.py). mysite/asgi.py turns this on; under WSGI an async view would need
+# an event loop of its own for every request.
+ASYNC_CUSTOMER_VIEWS = os.environ.get('ASYNC_CUSTOMER_VIEWS', '0') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-
-DATABASES = {
+# UPDATED: Chosen from the environment (DB_PROFILE=sqlite | sqlite-basic | postgres),
+# see mysite/db_profiles.py. Tuned SQLite is the default.
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+DATABASES, SQLITE_PRAGMAS = database_profile(DB_PROFILE, os.environ, BASE_DIR)
+# NEW: Stored in the database file, so it is set once with `manage.py sqlite_journal_mode`
+# rather than on every connection
+SQLITE_JOURNAL_MODE = JOURNAL_MODES.get(DB_PROFILE)
+if TESTING and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Tests run on an in-memory database; this keeps anything else off the tracked db.sqlite3
+    DATABASES['default']['NAME'] = os.path.join(TESTING_DIR, 'db.sqlite3')
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The public menu is cached per restaurant (see myapp/menu_cache.py), and each menu card's
+# rendered markup per item ({% cache %} in menu.html). Those entries are keyed by version or
+# updated_at and never go stale, so the per-process LocMemCache is fine for them.
+# UPDATED: Entries that other processes must see change ('shared': menu version stamps, cached
+# users) go to a cache every process on the host reads: the web server, the task worker and
+# management commands like import_items. Point SHARED_CACHE_DIR at a common directory, or swap
+# the backend for Redis/Memcached when running on several hosts.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodapp',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+if TESTING:
+    # Tests never read or overwrite the dev server's entries
+    CACHES['shared']['LOCATION'] = os.path.join(TESTING_DIR, 'cache')
+
+
+# Live kitchen order feed (see myapp/events.py). The in-process broker only reaches
+# dashboards connected to the same ASGI process; point this at a shared pub/sub
+# backend when running several workers.
+ORDER_EVENTS_BROKER = 'myapp.events.InProcessBroker'
+
+# Per-request timing and SQL instrumentation (see myapp/instrumentation.py).
+# Every request is timed; SAMPLE_RATE of them also have their queries counted.
+# Requests slower than SLOW_MS go to LOG_FILE; summarise it with
+# `python manage.py slow_request_report`.
+REQUEST_INSTRUMENTATION = {
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.05,
+    'SLOW_MS': 200 if DEBUG else 500,
+    'LOG_FILE': BASE_DIR / 'logs' / 'slow_requests.jsonl',
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
 }
 
 
+# NEW: Sessions are read through the cache and written through to the database, and the
+# logged-in user (with their profile) is cached too, see users/backends.py
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -130,4 +212,15 @@ LOGIN_REDIRECT_URL = 'myapp:index'
 LOGIN_URL = 'login'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'pictures')
-MEDIA_URL = '/pictures/'
\ No newline at end of file
+MEDIA_URL = '/pictures/'
+
+# NEW: Background task result files (exports, QR sheets). Private: served only to the
+# task's owner by myapp:task_download, never under MEDIA_URL. See myapp/tasks.py.
+TASK_RESULTS_ROOT = os.environ.get('TASK_RESULTS_ROOT', os.path.join(BASE_DIR, 'task_results'))
+
+# NEW: Profile picture uploads waiting to be normalised by the task worker. Private: they still
+# carry their EXIF data, so they never go under MEDIA_ROOT. See users/uploads.py.
+PROFILE_UPLOADS_ROOT = os.environ.get('PROFILE_UPLOADS_ROOT', os.path.join(BASE_DIR, 'profile_uploads'))
+# NEW: A new profile picture only appears once `run_task_worker` has processed it. Set
+# PROFILE_IMAGES_INLINE=1 to process it in the upload request instead (e.g. without a worker).
+PROFILE_IMAGES_INLINE = os.environ.get('PROFILE_IMAGES_INLINE', '0') == '1'
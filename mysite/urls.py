@@ -7,13 +7,17 @@ URL configuration for mysite project.
 from django.contrib import admin
 from django.urls import path
 from django.urls import include
-from django.conf.urls.static import static
 from django.conf import settings
 from django.views.generic import TemplateView
 
+from myapp import media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('myapp.urls')),
     path('users/', include('users.urls')),
     path("how-to-use/", TemplateView.as_view(template_name="myapp/how_to_use.html"), name="how_to_use"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # UPDATED: Uploads are served by myapp.media (ranges, conditional GETs, lazy image variants)
+    # instead of the development-only static() route
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", media.serve, name="media"),
+]
\ No newline at end of file
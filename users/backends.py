@@ -0,0 +1,43 @@
+"""
+Authentication backend that keeps the logged-in user, with their profile, in the cache.
+
+Without it every authenticated request runs one query for the User, and pages
+that show ``user.profile`` one more. The cached copy is dropped whenever the
+User or its Profile is saved or deleted (signals in users/models.py), which
+covers logins, password changes and profile edits. Bulk ``update()`` calls
+bypass signals; USER_CACHE_TIMEOUT bounds how long such a change can go unseen.
+
+The copies live in the 'shared' cache, so a change made by another process
+(e.g. the task worker applying a new profile picture) drops them everywhere.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+USER_CACHE_TIMEOUT = 60 * 5
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    caches['shared'].delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() (run on every request) reads through the cache."""
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        cache = caches['shared']
+        user = cache.get(key)
+        if user is None:
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -1,7 +1,11 @@
 from django.contrib.auth.forms import UserCreationForm
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.contrib.auth.models import User
+from mysite.images import open_image
+
 from .models import Profile
+from .uploads import save_upload
 
 class RegisterForm(UserCreationForm):
     email = forms.EmailField()
@@ -21,4 +25,32 @@ class UserUpdateForm(forms.ModelForm):
 class ProfileUpdateForm(forms.ModelForm):
     class Meta:
         model = Profile
-        fields = ['image', 'location']
\ No newline at end of file
+        fields = ['image', 'location']
+
+    # NEW: An uploaded picture is only checked here (readable, not over MAX_IMAGE_PIXELS). It is kept
+    # in private storage as the profile's pending_image and the profile keeps its current picture until
+    # the task worker has re-encoded it without EXIF data (see users/uploads.py)
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image.seek(0)
+            try:
+                open_image(image.read())
+            except ValueError as error:
+                raise forms.ValidationError(str(error))
+            self.upload = image
+            return self.instance.image
+        return image
+
+    # UPDATED: Writes only the fields the form changed. The instance is the cached user's profile,
+    # which may predate the worker applying a picture, so saving the whole row could undo it.
+    def save(self, commit=True):
+        upload = getattr(self, 'upload', None)
+        if upload is not None:
+            self.instance.pending_image = save_upload(upload)
+        profile = super().save(commit=False)
+        if commit:
+            profile.save(update_fields=[
+                'pending_image' if name == 'image' and upload is not None else name for name in self.changed_data
+            ])
+        return profile
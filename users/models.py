@@ -1,33 +1,50 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save # NEW: Import post_save signal
+from django.db.models.signals import post_save, post_delete # NEW: Import post_save/post_delete signals
 from django.dispatch import receiver # NEW: Import receiver
 
+from mysite.images import PROFILE_VARIANT_WIDTHS, is_content_addressed, variant_name
+
+from .backends import invalidate_user
+
+# Width of the avatar variant; the profile pages show it at up to 128 CSS pixels, so 2x for HiDPI
+AVATAR_WIDTH = PROFILE_VARIANT_WIDTHS[-1]
+
 # Create your models here.
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     image = models.ImageField(default='profilepic.jpg', upload_to='profile_pictures')
     location = models.CharField(max_length=100)
+    # NEW: Private name of an uploaded picture the task worker hasn't normalised yet (see users/uploads.py)
+    pending_image = models.CharField(max_length=100, blank=True, default='')
     
     def __str__(self):
         return self.user.username
 
+    # NEW: Avatars are shown small; pictures stored by ProfileUpdateForm have a lazily made variant
+    @property
+    def avatar_url(self):
+        if is_content_addressed(self.image.name):
+            return self.image.storage.url(variant_name(self.image.name, AVATAR_WIDTH))
+        return self.image.url
+
 # NEW: Signal to create a Profile when a new User is created
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
-# NEW: Signal to save the Profile when the User object is saved
+# UPDATED: The Profile is no longer re-saved on every User save (e.g. each last_login
+# update at login); profile_update saves it only when the form changed it.
+
+# NEW: Drop the cached logged-in user (see users/backends.py) when it or its profile changes
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    # This prevents the error on first access after creation, but handles saves on subsequent updates.
-    # We must ensure the profile exists before trying to save it.
-    try:
-        instance.profile.save()
-    except ObjectDoesNotExist:
-        # If the profile still doesn't exist (e.g., from an old user without the create signal)
-        # the defensive coding in the view already handles this, but we can prevent a
-        # potential error here too if we were to save the user elsewhere.
-        pass
\ No newline at end of file
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_cached_profile_user(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
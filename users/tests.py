@@ -1,3 +1,181 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from myapp.models import Task
+from mysite.images import PROFILE_IMAGE_DIR, PROFILE_IMAGE_SIZE, variant_name
+
+from .backends import user_cache_key
+from .models import AVATAR_WIDTH, Profile
+from .uploads import apply_upload
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = User.objects.create_user('chef', email='chef@example.com', password='pass12345')
+        self.client.login(username='chef', password='pass12345')
+        self.client.get(reverse('profile'))
+
+    def test_staff_page_needs_no_auth_queries_once_cached(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('profile'))
+        self.assertContains(response, 'chef')
+
+    def test_profile_and_user_changes_invalidate_the_cache(self):
+        profile = self.user.profile
+        profile.location = 'Pune'
+        profile.save()
+        self.assertIsNone(caches['shared'].get(user_cache_key(self.user.id)))
+        self.assertContains(self.client.get(reverse('profile')), 'Pune')
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_login_does_not_resave_profile(self):
+        self.client.logout()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.login(username='chef', password='pass12345')
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if 'users_profile' in q['sql']])
+
+    def test_unchanged_profile_form_writes_nothing(self):
+        profile = self.user.profile
+        profile.location = 'Pune'
+        profile.save()
+        data = {'username': 'chef', 'email': 'chef@example.com', 'location': 'Pune'}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('profile_update'), data)
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        media_root, uploads_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, uploads_root, ignore_errors=True)
+        self.uploads_root = uploads_root
+        override = override_settings(MEDIA_ROOT=media_root, PROFILE_UPLOADS_ROOT=uploads_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('chef', email='chef@example.com', password='pass12345')
+        self.client.force_login(self.user)
+
+    def post_upload(self, color='orange'):
+        image = Image.new('RGB', (1600, 1200), color)
+        exif = image.getexif()
+        exif[0x0112] = 6  # Orientation: rotated 90 degrees
+        exif[0x010F] = 'PhoneCam'  # Make
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        upload = SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+        data = {'username': 'chef', 'email': 'chef@example.com', 'location': 'Pune', 'image': upload}
+        self.client.post(reverse('profile_update'), data)
+        return Profile.objects.get(user=self.user)
+
+    def run_worker(self):
+        call_command('run_task_worker', once=True, processes=0, stdout=StringIO())
+
+    def upload(self, color='orange'):
+        self.post_upload(color)
+        self.run_worker()
+        return Profile.objects.get(user=self.user)
+
+    def test_upload_is_kept_private_until_the_worker_runs(self):
+        profile = self.post_upload()
+        self.assertEqual(profile.image.name, 'profilepic.jpg')
+        self.assertEqual(os.listdir(self.uploads_root), [profile.pending_image])
+        self.assertFalse(default_storage.exists(PROFILE_IMAGE_DIR))
+        self.assertEqual(Task.objects.get().name, 'normalize_profile_image')
+
+        self.run_worker()
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.pending_image, os.listdir(self.uploads_root)), ('', []))
+        self.assertEqual(Task.objects.get().result, {'image': profile.image.name, 'applied': True})
+
+    @override_settings(PROFILE_IMAGES_INLINE=True)
+    def test_inline_setting_applies_upload_without_the_worker(self):
+        profile = self.post_upload()
+        self.assertTrue(profile.image.name.startswith(f'{PROFILE_IMAGE_DIR}/'))
+        self.assertEqual((profile.pending_image, Task.objects.count()), ('', 0))
+
+    def test_picture_applied_by_another_process_is_shown_and_kept(self):
+        name = self.post_upload().pending_image
+        self.client.get(reverse('profile'))  # Caches the user, picture still pending
+        # The worker is another process: its own process-local cache, the same shared one
+        worker_caches = {**settings.CACHES, 'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'task-worker',
+        }}
+        with override_settings(CACHES=worker_caches):
+            stored = apply_upload(self.user.id, name)['image']
+        self.assertContains(self.client.get(reverse('profile')), variant_name(stored, AVATAR_WIDTH))
+
+        data = {'username': 'chef', 'email': 'chef@example.com', 'location': 'Goa'}
+        self.client.post(reverse('profile_update'), data)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.image.name, profile.pending_image, profile.location), (stored, '', 'Goa'))
+
+    def test_edit_from_a_stale_cached_profile_keeps_the_new_picture(self):
+        name = self.post_upload().pending_image
+        self.client.get(reverse('profile'))
+        # As if the invalidation never reached this process
+        with mock.patch('users.uploads.invalidate_user'):
+            stored = apply_upload(self.user.id, name)['image']
+        data = {'username': 'chef', 'email': 'chef@example.com', 'location': 'Goa'}
+        self.client.post(reverse('profile_update'), data)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.image.name, profile.pending_image, profile.location), (stored, '', 'Goa'))
+
+    def test_later_upload_wins(self):
+        self.post_upload('orange')
+        latest = self.post_upload('navy').pending_image
+        self.run_worker()
+        profile = Profile.objects.get(user=self.user)
+        first, second = [task.result for task in Task.objects.order_by('id')]
+        self.assertEqual((first['applied'], second['applied']), (False, True))
+        self.assertEqual(profile.image.name, second['image'])
+        self.assertNotEqual(first['image'], second['image'])
+        self.assertNotIn(latest, os.listdir(self.uploads_root))
+
+    def test_upload_is_upright_downscaled_and_stripped(self):
+        profile = self.upload()
+        self.assertTrue(profile.image.name.startswith(f'{PROFILE_IMAGE_DIR}/'))
+        with Image.open(profile.image.path) as image:
+            self.assertEqual(image.size, (PROFILE_IMAGE_SIZE * 3 // 4, PROFILE_IMAGE_SIZE))
+            self.assertFalse(image.getexif())
+
+    def test_same_picture_is_stored_once(self):
+        first = self.upload().image.name
+        self.assertEqual(self.upload().image.name, first)
+        self.assertEqual(len(os.listdir(os.path.dirname(self.user.profile.image.path))), 1)
+
+    def test_avatar_variant_is_made_on_first_request(self):
+        profile = self.upload()
+        self.assertFalse(default_storage.exists(variant_name(profile.image.name, 256)))
+        response = self.client.get(profile.avatar_url)
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (192, 256))
+        self.assertTrue(default_storage.exists(variant_name(profile.image.name, 256)))
+
+    def test_unreadable_upload_is_rejected(self):
+        upload = SimpleUploadedFile('me.jpg', b'not an image', content_type='image/jpeg')
+        data = {'username': 'chef', 'email': 'chef@example.com', 'location': 'Pune', 'image': upload}
+        response = self.client.post(reverse('profile_update'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Profile.objects.get(user=self.user).image.name, 'profilepic.jpg')
@@ -0,0 +1,76 @@
+# mysite/users/uploads.py
+
+"""Profile picture uploads, normalised off the request.
+
+ProfileUpdateForm only checks the upload's header, keeps the file in private
+storage (PROFILE_UPLOADS_ROOT, not MEDIA_ROOT) and records its name in
+``Profile.pending_image``; the profile keeps showing the old picture.
+``queue_upload()`` then sends ``profile_image_uploaded``. The task queue
+(myapp.tasks) receives it and runs ``apply_upload()`` on the worker, which
+re-encodes the picture without its EXIF data (see mysite/images.py), stores it
+publicly and switches the profile over. The worker is therefore required for
+new pictures to appear; with settings.PROFILE_IMAGES_INLINE the upload is
+applied in the request instead.
+
+The switch is a conditional UPDATE on ``pending_image``, so a picture
+uploaded later always wins over one still being processed.
+"""
+
+import os
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.dispatch import Signal
+
+from mysite.images import PROFILE_IMAGE_SIZE, normalize_image, store_profile_image
+
+from .backends import invalidate_user
+from .models import Profile
+
+# Sent with `profile` and the private upload `name` once the profile points at it
+profile_image_uploaded = Signal()
+
+
+def upload_storage():
+    return FileSystemStorage(location=settings.PROFILE_UPLOADS_ROOT)
+
+
+def save_upload(upload):
+    """Keeps an uploaded file in private storage. Returns its name there."""
+    ext = os.path.splitext(upload.name)[1].lower()[:10]
+    upload.seek(0)
+    return upload_storage().save(f'{uuid4().hex}{ext}', upload)
+
+
+def queue_upload(profile):
+    """Hands the profile's pending picture to the task worker, or applies it now with PROFILE_IMAGES_INLINE."""
+    if settings.PROFILE_IMAGES_INLINE:
+        apply_upload(profile.user_id, profile.pending_image)
+    else:
+        profile_image_uploaded.send(sender=Profile, profile=profile, name=profile.pending_image)
+
+
+def apply_upload(user_id, name):
+    """Normalises and stores a pending upload, then shows it on the profile if it is still the latest.
+
+    The private upload is deleted either way. Raises ValueError for unreadable
+    or oversized images.
+    """
+    storage = upload_storage()
+    try:
+        with storage.open(name) as upload:
+            normalized = normalize_image(upload.read(), PROFILE_IMAGE_SIZE)
+    except ValueError:
+        Profile.objects.filter(user_id=user_id, pending_image=name).update(pending_image='')
+        raise
+    finally:
+        storage.delete(name)
+
+    stored = store_profile_image(normalized)
+    # Only if no newer picture was uploaded meanwhile
+    if Profile.objects.filter(user_id=user_id, pending_image=name).update(image=stored, pending_image=''):
+        # A queryset update sends no post_save, so drop the cached user here
+        invalidate_user(user_id)
+        return {'image': stored, 'applied': True}
+    return {'image': stored, 'applied': False}
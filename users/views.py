@@ -4,6 +4,7 @@ from .forms import RegisterForm, UserUpdateForm, ProfileUpdateForm
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from .models import Profile # Import Profile model
+from .uploads import queue_upload
 from django.core.exceptions import ObjectDoesNotExist # Import ObjectDoesNotExist for clean error handling
 
 def register(request):
@@ -41,8 +42,14 @@ def profile_update(request):
         p_form = ProfileUpdateForm(request.POST, request.FILES, instance=user_profile)
 
         if u_form.is_valid() and p_form.is_valid():
-            u_form.save()
-            p_form.save()
+            # NEW: Only write (and invalidate the cached user) what the form actually changed
+            if u_form.has_changed():
+                u_form.save()
+            if p_form.has_changed():
+                user_profile = p_form.save()
+                # NEW: A new picture is normalised by the task worker, not in this request
+                if user_profile.pending_image and 'image' in p_form.changed_data:
+                    queue_upload(user_profile)
             messages.success(request, f'Your account has been updated!')
             return redirect('profile')
 